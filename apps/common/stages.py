@@ -0,0 +1,19 @@
+import asyncio
+
+
+async def run_stages(*stages):
+    """
+    并行运行流水线各阶段，任一阶段出错时取消其余阶段并抛出该异常
+    """
+    tasks = [asyncio.create_task(stage) for stage in stages]
+    try:
+        done, pending = await asyncio.wait(
+            tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if task.exception():
+                raise task.exception()  # type: ignore
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,74 +1,125 @@
-from fastapi import APIRouter, HTTPException
-from tortoise.transactions import in_transaction
-from apps.logistic.models import AreaCode, PostPrice
+from fastapi import APIRouter, HTTPException, Body, File, Form, UploadFile
+from apps.logistic.models import AreaCode, ImportJob, PostPrice
+from apps.logistic.importer import (import_area_code_excel,
+                                    import_post_price_excel, rollback_table)
+from apps.logistic.rates import get_rate_table, load_rate_table
+from apps.logistic.zones import get_zone_index, load_zone_index
+from apps.logistic.quotes import quote_orders
+from apps.logistic.quote_cache import quote_cache
+from apps.logistic.jobs import (IMPORT_TABLES, find_duplicate_job,
+                                get_progress, save_upload, store_upload)
+from apps.logistic.tasks import import_job_task
 from pathlib import Path
 from typing import List, Dict
-import openpyxl  # 使用openpyxl代替pandas
+from redis import RedisError
+import asyncio
+import os
+import time
 
 router = APIRouter()
 
+# 物流分区/价格导入方式
+IMPORT_MODES = ('replace', 'diff', 'swap')
 
-async def get_existing_records() -> List[Dict]:
-    """获取所有已存在的记录的三字段组合"""
-    records = await AreaCode.all().values('country_code', 'ship_code',
-                                          'post_code')
-    return [{
-        'country_code': r['country_code'],
-        'ship_code': r['ship_code'],
-        'post_code': r['post_code']
-    } for r in records]
+
+# 上传导入: 支持的文件类型、等待任务完成后重新加载内存数据的检查间隔和最长时间(秒)
+UPLOAD_SUFFIXES = ('.xlsx', '.csv', '.parquet')
+JOB_WATCH_INTERVAL = 2
+JOB_WATCH_TIMEOUT = 6 * 60 * 60
+_job_watchers = set()  # 保留后台任务引用，避免被回收
+
+
+def changed(mode, stats):
+    """导入后数据是否有变化(整表重新写入或切换时始终视为有变化)"""
+    return mode != 'diff' or any(
+        stats[k] for k in ('inserted', 'updated', 'deleted'))
+
+
+async def reload_table(table):
+    """重新加载物流分区索引或运费表，清空运费缓存，返回新版本号"""
+    if table == 'area_code':
+        version = (await load_zone_index()).version
+    else:
+        version = (await load_rate_table()).version
+    quote_cache.clear()
+    return version
+
+
+def job_info(job):
+    return {
+        "job_id": job.id,
+        "task_id": job.task_id,
+        "table": job.table,
+        "mode": job.mode,
+        "file_name": job.file_name,
+        "file_size": job.file_size,
+        "sha256": job.sha256,
+        "job_status": job.status,
+        "rows_parsed": job.rows_parsed,
+        "rows_written": job.rows_written,
+        "rows_skipped": job.rows_skipped,
+        "rows_per_sec": job.rows_per_sec,
+        "message": job.message,
+        "result": job.result,
+        "create_time": job.create_time,
+        "start_time": job.start_time,
+        "finish_time": job.finish_time
+    }
+
+
+async def watch_import_job(job_id):
+    """
+    等待上传导入任务完成(在Celery worker中执行)，数据有变化时重新加载本进程的内存数据
+    """
+    deadline = time.monotonic() + JOB_WATCH_TIMEOUT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(JOB_WATCH_INTERVAL)
+        try:
+            job = await ImportJob.get_or_none(id=job_id)
+            if job is None or job.status == "failed":
+                return
+            if job.status == "success":
+                if changed(job.mode, job.result or {}):
+                    await reload_table(job.table)
+                return
+        except Exception as e:
+            print(f"检查导入任务 {job_id} 状态失败: {str(e)}")
 
 
 @router.get("/import_area_code/", summary="导入物流分区代码")
-async def import_area_code():
+async def import_area_code(mode: str = "replace"):
+    """
+    导入 media/load/area_code.xlsx
+    参数:
+        mode: replace 删除全部后重新写入(默认); diff 按 国家+渠道代码+邮编 比较，
+              只写入新增、变更和删除的记录; swap 写入影子表后原子切换，
+              旧数据保留为 area_code_prev(MySQL)
+        该表正在导入或回滚时返回400
+    """
+    if mode not in IMPORT_MODES:
+        raise HTTPException(status_code=400,
+                            detail="mode 取值为 replace、diff 或 swap")
     excel_path = Path("media/load/area_code.xlsx")
 
     if not excel_path.exists():
         raise HTTPException(status_code=404, detail="Excel文件不存在")
 
     try:
-        # 使用openpyxl读取Excel文件
-        workbook = openpyxl.load_workbook(excel_path)
-        sheet = workbook.active
-
-        # 获取标题行
-        headers = [cell.value for cell in sheet[1]]
-        required_columns = [
-            'country_code', 'name', 'ship_code', 'post_code', 'area', 'service'
-        ]
-
-        # 检查必要列是否存在
-        missing_columns = [
-            col for col in required_columns if col not in headers
-        ]
-        if missing_columns:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Excel缺少必要列: {', '.join(missing_columns)}")
-
-        # 准备批量创建的数据
-        to_create = []
-        for row in sheet.iter_rows(min_row=2, values_only=True):
-            to_create.append(
-                AreaCode(country_code=row[headers.index('country_code')],
-                         name=row[headers.index('name')],
-                         ship_code=row[headers.index('ship_code')],
-                         post_code=row[headers.index('post_code')],
-                         area=row[headers.index('area')],
-                         is_service=False
-                         if str(row[headers.index('service')]).lower()
-                         == "out of network" else True))
-
-        # 先删除所有数据再批量创建
-        async with in_transaction():
-            await AreaCode.all().delete()
-            if to_create:
-                await AreaCode.bulk_create(to_create)
+        # 流式读取Excel并分批写入
+        stats = await import_area_code_excel(excel_path, mode)
+
+        # 数据有变化时重建内存邮编分区索引，清空运费缓存
+        if changed(mode, stats):
+            index = await load_zone_index()
+            quote_cache.clear()
+        else:
+            index = await get_zone_index()
 
         return {
             "status": "success",
-            "created": len(to_create),
-            "deleted": "all"  # 表示已删除所有旧数据
+            "mode": mode,
+            **stats,
+            "zone_version": index.version
         }
 
     except Exception as e:
@@ -76,60 +127,213 @@ async def import_area_code():
 
 
 @router.get("/import_post_price/", summary="导入物流价格数据")
-async def import_post_price():
+async def import_post_price(mode: str = "replace"):
+    """
+    导入 media/load/post_price.xlsx
+    参数:
+        mode: replace 删除全部后重新写入(默认); diff 按 渠道代码+区域+重量区间 比较，
+              只写入新增、变更和删除的记录; swap 写入影子表后原子切换，
+              旧数据保留为 post_price_prev(MySQL)
+        该表正在导入或回滚时返回400
+    """
+    if mode not in IMPORT_MODES:
+        raise HTTPException(status_code=400,
+                            detail="mode 取值为 replace、diff 或 swap")
     excel_path = Path("media/load/post_price.xlsx")
 
     if not excel_path.exists():
         raise HTTPException(status_code=404, detail="Excel文件不存在")
 
     try:
-        # 使用openpyxl读取Excel文件
-        workbook = openpyxl.load_workbook(excel_path)
-        sheet = workbook.active
-
-        # 获取标题行
-        headers = [cell.value for cell in sheet[1]]
-        required_columns = [
-            'country_code', 'carrier_name', 'carrier_code', 'min_weight',
-            'max_weight', 'area', 'basic_price', 'calc_price', 'volume_ratio',
-            'is_elec'
-        ]
-
-        # 检查必要列是否存在
-        missing_columns = [
-            col for col in required_columns if col not in headers
-        ]
-        if missing_columns:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Excel缺少必要列: {', '.join(missing_columns)}")
-
-        # 准备批量创建的数据
-        to_create = []
-        for row in sheet.iter_rows(min_row=2, values_only=True):
-            to_create.append(
-                PostPrice(country_code=row[headers.index('country_code')],
-                          carrier_name=row[headers.index('carrier_name')],
-                          carrier_code=row[headers.index('carrier_code')],
-                          min_weight=row[headers.index('min_weight')],
-                          max_weight=row[headers.index('max_weight')],
-                          area=row[headers.index('area')],
-                          basic_price=row[headers.index('basic_price')],
-                          calc_price=row[headers.index('calc_price')],
-                          volume_ratio=row[headers.index('volume_ratio')],
-                          is_elec=bool(row[headers.index('is_elec')])))
-
-        # 先删除所有数据再批量创建
-        async with in_transaction():
-            await PostPrice.all().delete()
-            if to_create:
-                await PostPrice.bulk_create(to_create)
+        # 流式读取Excel并分批写入
+        stats = await import_post_price_excel(excel_path, mode)
+
+        # 数据有变化时重建内存运费表，清空运费缓存
+        if changed(mode, stats):
+            table = await load_rate_table()
+            quote_cache.clear()
+        else:
+            table = await get_rate_table()
 
         return {
             "status": "success",
-            "created": len(to_create),
-            "deleted": "all"  # 表示已删除所有旧数据
+            "mode": mode,
+            **stats,
+            "rate_version": table.version
         }
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"导入失败: {str(e)}")
+
+
+@router.post("/rollback_table/", summary="回滚物流分区/价格表到上一版本")
+async def rollback_logistic_table(table: str):
+    """
+    将 swap 方式导入前的数据切换回正式表(再次调用会切换回来)
+    之后用 replace/diff 方式改写过正式表时上一版本已删除，不能回滚
+    参数:
+        table: area_code 或 post_price
+    """
+    if table not in ('area_code', 'post_price'):
+        raise HTTPException(status_code=400,
+                            detail="table 取值为 area_code 或 post_price")
+    try:
+        previous = await rollback_table(
+            AreaCode if table == 'area_code' else PostPrice)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"回滚失败: {str(e)}")
+    version = await reload_table(table)
+
+    return {
+        "status": "success",
+        "table": table,
+        "previous": previous,  # 切换前的数据现在保存在该表
+        "version": version
+    }
+
+
+@router.post("/upload_import/", summary="上传物流分区/价格文件并后台导入")
+async def upload_import(file: UploadFile = File(...),
+                        table: str = Form(...),
+                        mode: str = Form("replace"),
+                        force: bool = Form(False)):
+    """
+    上传Excel/CSV/Parquet文件(边接收边写入磁盘并计算sha256)，由Celery任务后台导入
+    相同内容的文件正在以相同的表和方式导入(等待或运行中)时，直接返回该任务；
+    之前的导入已结束时重新导入
+    参数:
+        file: xlsx、csv 或 parquet 文件，列名与Excel标题相同
+        table: area_code 或 post_price
+        mode: replace、diff 或 swap，见 import_area_code
+        force: 忽略正在进行的相同任务，重新导入
+    返回: 导入任务信息，用 /logistic/import_job/{job_id} 查询进度
+    """
+    if table not in IMPORT_TABLES:
+        raise HTTPException(status_code=400,
+                            detail="table 取值为 area_code 或 post_price")
+    if mode not in IMPORT_MODES:
+        raise HTTPException(status_code=400,
+                            detail="mode 取值为 replace、diff 或 swap")
+    suffix = Path(file.filename or '').suffix.lower()
+    if suffix not in UPLOAD_SUFFIXES:
+        raise HTTPException(status_code=400,
+                            detail=f"只支持 {', '.join(UPLOAD_SUFFIXES)} 文件")
+
+    temp_path, sha256, size = await asyncio.to_thread(save_upload, file.file,
+                                                      suffix)
+    job = None if force else await find_duplicate_job(sha256, table, mode)
+    if job is not None:
+        await asyncio.to_thread(os.unlink, temp_path)
+        return {"status": "duplicate", **job_info(job)}
+
+    path = await asyncio.to_thread(store_upload, temp_path, sha256, suffix)
+    job = await ImportJob.create(table=table,
+                                 mode=mode,
+                                 file_name=file.filename[:200],
+                                 file_path=str(path),
+                                 file_size=size,
+                                 sha256=sha256)
+    try:
+        task = import_job_task.delay(job.id)
+    except Exception as e:
+        job.status = "failed"
+        job.message = f"任务提交失败: {str(e)}"[:500]
+        await job.save(update_fields=['status', 'message'])
+        raise HTTPException(status_code=503, detail=job.message)
+    job.task_id = task.id
+    await job.save(update_fields=['task_id'])
+    watcher = asyncio.create_task(watch_import_job(job.id))
+    _job_watchers.add(watcher)
+    watcher.add_done_callback(_job_watchers.discard)
+    return {"status": "started", **job_info(job)}
+
+
+@router.get("/import_job/{job_id}", summary="查询上传导入任务进度")
+async def get_import_job(job_id: int):
+    """
+    查询导入任务状态；运行中的任务返回Redis中的实时进度(已解析、已写入、跳过行数和每秒行数)
+    """
+    job = await ImportJob.get_or_none(id=job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="导入任务不存在")
+    info = job_info(job)
+    if job.status == "running":
+        try:
+            info.update(await asyncio.to_thread(get_progress, job.id) or {})
+        except RedisError as e:
+            info["message"] = f"实时进度不可用: {str(e)}"
+    return info
+
+
+@router.get("/rate_table/", summary="获取内存运费表信息")
+async def get_rate_table_info():
+    """
+    获取内存运费表的版本、数据摘要、记录数和加载时间
+    """
+    table = await get_rate_table()
+    return {
+        "version": table.version,
+        "digest": table.digest,
+        "rows": table.rows,
+        "groups": len(table.groups),
+        "loaded_at": table.loaded_at.strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+
+@router.get("/zone_index/", summary="获取内存邮编分区索引信息")
+async def get_zone_index_info():
+    """
+    获取内存邮编分区索引的版本、记录数和加载时间
+    """
+    index = await get_zone_index()
+    return {
+        "version": index.version,
+        "rows": index.rows,
+        "digest": index.digest,
+        "post_codes": len(index.exact),
+        "ranges": sum(len(r) for r in index.ranges.values()),
+        "loaded_at": index.loaded_at.strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+
+@router.get("/quote_cache/", summary="获取运费缓存统计")
+async def get_quote_cache_info():
+    """
+    获取运费缓存的记录数、命中/未命中次数和淘汰次数
+    """
+    return quote_cache.stats()
+
+
+@router.post("/batch_quote/", summary="批量计算订单运费")
+async def batch_quote(orders: List[Dict] = Body(..., embed=True)):
+    """
+    批量计算订单各物流渠道运费，每个订单的渠道按运费从低到高排序
+    参数:
+        orders: 订单列表，格式示例:
+        [{
+            order_number: "081298327265",
+            country_code: "AU",
+            post_code: "2848",
+            weight: 80
+        }]
+    """
+    quote_requests = []
+    for od in orders:
+        try:
+            weight = int(od.get('weight', 0))
+        except (ValueError, TypeError):
+            weight = 0
+        quote_requests.append((od.get('country_code',
+                                      ''), od.get('post_code', ''), weight))
+
+    zone_index = await get_zone_index()
+    rate_table = await get_rate_table()
+    options = quote_orders(quote_requests, zone_index, rate_table)
+    return {
+        "rate_version": rate_table.version,
+        "zone_version": zone_index.version,
+        "orders": [{
+            "order_number": od.get('order_number', ''),
+            "options": post_list
+        } for od, post_list in zip(orders, options)]
+    }
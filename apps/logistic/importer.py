@@ -0,0 +1,830 @@
+import asyncio
+import csv
+import itertools
+import operator
+import os
+import resource
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from functools import partial
+from pathlib import Path
+
+import openpyxl
+import redis.asyncio as aioredis
+from redis.exceptions import LockError
+from tortoise import connections
+from tortoise.transactions import in_transaction
+
+from apps.common.stages import run_stages
+from apps.logistic.models import AreaCode, PostPrice
+from config import config
+
+CHUNK_SIZE = 2000  # 每次批量写入的行数
+COLUMN_BATCH_SIZE = 10000  # CSV/Parquet每次按列转换的行数
+LOAD_DATA_CHUNK_SIZE = 20000  # LOAD DATA LOCAL INFILE 每批写入的行数
+QUEUE_SIZE = 2  # 解析与写入之间的队列长度
+MAX_SKIPPED_REPORT = 100  # 返回的跳过行明细数量上限
+# 影子表切换: 写入中的新数据表、上一版本数据表、回滚时的临时表名后缀
+SHADOW_SUFFIX = '_shadow'
+PREVIOUS_SUFFIX = '_prev'
+SWAP_SUFFIX = '_swap'
+# 导入/回滚锁: 同一张表同时只能有一个导入或回滚(影子表和上一版本表名固定)
+IMPORT_LOCK_NAME = "logistic:import:lock:{table}"
+IMPORT_LOCK_TIMEOUT = 10 * 60  # 锁过期时间(秒)，导入期间定期续期
+IMPORT_LOCK_RENEW_INTERVAL = 60  # 续期间隔(秒)
+IMPORT_LOCK_WAIT = 60 * 60  # 等待锁的最长时间(秒)
+
+
+def to_text(value, max_length, required=False):
+    """
+    单元格转为字符串: 去除首尾空格，整数形式的小数去掉 .0(如邮编 2000.0)
+    超过字段长度或必填为空时抛出 ValueError
+    """
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = None if value is None else str(value).strip()
+    if not text:
+        if required:
+            raise ValueError("不能为空")
+        return None
+    if len(text) > max_length:
+        raise ValueError(f"超过{max_length}个字符: {text}")
+    return text
+
+
+def to_int(value, required=False):
+    """
+    单元格转为整数，公式计算产生的浮点误差(如 1000.9999999999999)取最接近的整数
+    """
+    if value is None or value == '':
+        if required:
+            raise ValueError("不能为空")
+        return None
+    number = float(value)
+    if abs(number - round(number)) > 1e-6:
+        raise ValueError(f"不是整数: {value}")
+    return round(number)
+
+
+def to_float(value, required=False):
+    if value is None or value == '':
+        if required:
+            raise ValueError("不能为空")
+        return None
+    return float(value)
+
+
+def to_bool(value):
+    """单元格转为布尔值，CSV中的 0/false 为False"""
+    if isinstance(value, str):
+        return value.strip().lower() not in ('', '0', 'false')
+    return bool(value)
+
+
+def to_service(value):
+    """service 列: out of network 表示不服务"""
+    return str(value).lower() != "out of network"
+
+
+class RowParser:
+    """
+    行解析: 每列一个转换函数，转换后的值按顺序对应模型字段
+    Excel逐行调用；CSV/Parquet按列调用 convert_columns，每列一次转换整列
+    转换函数或行校验抛出 ValueError/TypeError 表示该行无效
+    """
+
+    def __init__(self, model, fields, converters, check=None, key=None):
+        self.model = model
+        self.fields = fields
+        self.converters = converters
+        self.check = check  # 行校验函数，参数为转换后的字段值
+        self.key = key  # 自然键字段，导入文件中自然键重复的行跳过
+
+    def __call__(self, *values):
+        values = [convert(v) for convert, v in zip(self.converters, values)]
+        if self.check:
+            self.check(*values)
+        return self.model(**dict(zip(self.fields, values)))
+
+    def convert_columns(self, columns):
+        """
+        按列转换: 整列转换成功时不再逐个捕获异常，出错的列再逐个转换找出无效行
+        参数:
+            columns: 各列的值列表(与转换函数顺序一致)
+        返回: (每行的字段值元组列表, {行位置: 错误})，每行只记录第一个错误
+        """
+        converted, errors = [], {}
+        for convert, values in zip(self.converters, columns):
+            try:
+                converted.append(list(map(convert, values)))
+                continue
+            except (ValueError, TypeError):
+                pass
+            result = []
+            for i, value in enumerate(values):
+                try:
+                    result.append(convert(value))
+                except (ValueError, TypeError) as e:
+                    result.append(None)
+                    errors.setdefault(i, str(e))
+            converted.append(result)
+        rows = list(zip(*converted))
+        if self.check:
+            for i, values in enumerate(rows):
+                if i in errors:
+                    continue
+                try:
+                    self.check(*values)
+                except (ValueError, TypeError) as e:
+                    errors[i] = str(e)
+        return rows, errors
+
+
+# 物流分区: 文件列(按顺序传给解析函数)
+AREA_CODE_COLUMNS = ('country_code', 'name', 'ship_code', 'post_code', 'area',
+                     'service')
+
+# 物流分区: 自然键和比较的字段(差异导入)，字段与文件列一一对应
+AREA_CODE_KEY = ('country_code', 'ship_code', 'post_code')
+AREA_CODE_FIELDS = ('country_code', 'name', 'ship_code', 'post_code', 'area',
+                    'is_service')
+
+parse_area_code = RowParser(AreaCode, AREA_CODE_FIELDS, (
+    partial(to_text, max_length=5, required=True),
+    partial(to_text, max_length=20),
+    partial(to_text, max_length=20, required=True),
+    partial(to_text, max_length=10, required=True),
+    partial(to_text, max_length=10),
+    to_service,
+), key=AREA_CODE_KEY)
+
+# 物流价格: 文件列(按顺序传给解析函数)
+POST_PRICE_COLUMNS = ('country_code', 'carrier_name', 'carrier_code',
+                      'min_weight', 'max_weight', 'area', 'basic_price',
+                      'calc_price', 'volume_ratio', 'is_elec')
+
+# 物流价格: 自然键(与运费表查询条件一致)和比较的字段(差异导入)，字段与文件列一一对应
+POST_PRICE_KEY = ('carrier_code', 'area', 'min_weight', 'max_weight')
+POST_PRICE_FIELDS = ('country_code', 'carrier_name', 'carrier_code',
+                     'min_weight', 'max_weight', 'area', 'basic_price',
+                     'calc_price', 'volume_ratio', 'is_elec')
+
+
+def check_post_price(country_code, carrier_name, carrier_code, min_weight,
+                     max_weight, *_):
+    if min_weight > max_weight:
+        raise ValueError(f"最小重量大于最大重量: {min_weight} > {max_weight}")
+
+
+parse_post_price = RowParser(PostPrice,
+                             POST_PRICE_FIELDS, (
+                                 partial(to_text, max_length=5),
+                                 partial(to_text, max_length=20),
+                                 partial(to_text, max_length=20, required=True),
+                                 partial(to_int, required=True),
+                                 partial(to_int, required=True),
+                                 partial(to_text, max_length=10),
+                                 partial(to_float, required=True),
+                                 partial(to_float, required=True),
+                                 to_int,
+                                 to_bool,
+                             ),
+                             check=check_post_price,
+                             key=POST_PRICE_KEY)
+
+
+class RowReader:
+    """
+    读取导入文件的基类: 标题行只解析一次得到列位置，子类的 _parse_rows 逐行返回
+    (行号, 模型实例)，校验失败和自然键重复的行记录行号和原因后跳过(各导入方式规则相同)
+    行号与表格软件中一致，标题为第1行
+    """
+
+    def __init__(self, headers, columns, parse):
+        headers = [str(h).strip() if h is not None else None for h in headers]
+        missing = [col for col in columns if col not in headers]
+        if missing:
+            self.close()
+            raise ValueError(f"文件缺少必要列: {', '.join(missing)}")
+        self.positions = [headers.index(col) for col in columns]
+        self.width = max(self.positions) + 1
+        self.pick = operator.itemgetter(*self.positions)
+        self.parse = parse
+        self.row_number = 1  # 当前行号
+        self.parsed = 0
+        self.blank = 0  # 空行数
+        self.skipped = 0
+        self.skipped_rows = []  # [{row, error}]，最多 MAX_SKIPPED_REPORT 条
+        self._valid_rows = self._unique_rows(self._parse_rows())
+
+    def skip(self, row_number, error):
+        self.skipped += 1
+        if len(self.skipped_rows) < MAX_SKIPPED_REPORT:
+            self.skipped_rows.append({'row': row_number, 'error': error})
+
+    def _parse_rows(self):
+        raise NotImplementedError
+
+    def _unique_rows(self, rows):
+        """自然键重复的行跳过，保留第一次出现的行"""
+        key_fields = self.parse.key
+        if not key_fields:
+            yield from rows
+            return
+        first_rows = {}  # {自然键: 第一次出现的行号}
+        for row_number, obj in rows:
+            key = tuple(getattr(obj, f) for f in key_fields)
+            first = first_rows.setdefault(key, row_number)
+            if first != row_number:
+                self.skip(row_number, f"与第{first}行重复: {key}")
+                continue
+            yield row_number, obj
+
+    def read_chunk(self, size):
+        """
+        读取并解析最多 size 个有效行
+        返回: 模型实例列表，读完时返回空列表
+        """
+        chunk = [obj for _, obj in itertools.islice(self._valid_rows, size)]
+        self.parsed += len(chunk)
+        return chunk
+
+    def read_records(self, key_fields, fields):
+        """
+        读取所有有效行(自然键重复的行已跳过)
+        返回: {自然键: 字段值元组}
+        """
+        records = {
+            tuple(getattr(obj, f) for f in key_fields):
+            tuple(getattr(obj, f) for f in fields)
+            for _, obj in self._valid_rows
+        }
+        self.parsed += len(records)
+        return records
+
+    def close(self):
+        pass
+
+
+class SheetReader(RowReader):
+    """流式读取Excel(read_only模式，不把整个工作表加载到内存)，逐行取出所需列并校验"""
+
+    def __init__(self, path, columns, parse):
+        self.workbook = openpyxl.load_workbook(path,
+                                               read_only=True,
+                                               data_only=True)
+        self.rows = self.workbook.active.iter_rows(values_only=True)
+        super().__init__(next(self.rows, ()), columns, parse)
+
+    def _parse_rows(self):
+        """逐行解析，返回 (行号, 模型实例)，空行和无效行跳过"""
+        for row in self.rows:
+            self.row_number += 1
+            if len(row) < self.width:
+                row = row + (None, ) * (self.width - len(row))
+            values = self.pick(row)
+            if all(v is None or v == '' for v in values):
+                self.blank += 1
+                continue
+            try:
+                yield self.row_number, self.parse(*values)
+            except (ValueError, TypeError) as e:
+                self.skip(self.row_number, str(e))
+
+    def close(self):
+        self.workbook.close()
+
+
+class ColumnReader(RowReader):
+    """
+    列式读取基类(CSV/Parquet): 子类的 _read_columns 每次返回一批行的各列值列表，
+    去掉空行后由 RowParser.convert_columns 整列转换和校验
+    """
+
+    def _read_columns(self):
+        raise NotImplementedError
+
+    def _parse_rows(self):
+        model, fields = self.parse.model, self.parse.fields
+        for columns in self._read_columns():
+            first = self.row_number + 1
+            self.row_number += len(columns[0])
+            row_numbers = range(first, self.row_number + 1)
+            filled = [
+                i for i, values in enumerate(zip(*columns))
+                if not all(v is None or v == '' for v in values)
+            ]
+            if len(filled) < len(row_numbers):
+                self.blank += len(row_numbers) - len(filled)
+                columns = [[values[i] for i in filled] for values in columns]
+                row_numbers = [row_numbers[i] for i in filled]
+            rows, errors = self.parse.convert_columns(columns)
+            for i, (row_number, values) in enumerate(zip(row_numbers, rows)):
+                if i in errors:
+                    self.skip(row_number, errors[i])
+                    continue
+                yield row_number, model(**dict(zip(fields, values)))
+
+
+class CsvReader(ColumnReader):
+    """读取CSV(UTF-8，兼容Excel另存的BOM)，每批 COLUMN_BATCH_SIZE 行转为列"""
+
+    def __init__(self, path, columns, parse):
+        self.file = open(path, encoding='utf-8-sig', newline='')
+        self.rows = csv.reader(self.file)
+        super().__init__(next(self.rows, ()), columns, parse)
+
+    def _read_columns(self):
+        while True:
+            rows = list(itertools.islice(self.rows, COLUMN_BATCH_SIZE))
+            if not rows:
+                break
+            # 列数不足的行(包括空行)补足空值，取出所需列后转置为列
+            picked = [
+                self.pick(row if len(row) >= self.width else row + [''] *
+                          (self.width - len(row))) for row in rows
+            ]
+            if len(self.positions) == 1:
+                picked = [(value, ) for value in picked]
+            yield [list(values) for values in zip(*picked)]
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetReader(ColumnReader):
+    """用 pyarrow 按批读取Parquet中需要的列，不读取其他列"""
+
+    def __init__(self, path, columns, parse):
+        # pyarrow 加载后占用内存较多，只在导入Parquet文件时加载
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("导入Parquet文件需要安装 pyarrow")
+        self.file = pq.ParquetFile(path)
+        self.columns = columns
+        super().__init__(self.file.schema_arrow.names, columns, parse)
+
+    def _read_columns(self):
+        for batch in self.file.iter_batches(batch_size=COLUMN_BATCH_SIZE,
+                                            columns=list(self.columns)):
+            if batch.num_rows:
+                yield [
+                    batch.column(name).to_pylist() for name in self.columns
+                ]
+
+    def close(self):
+        self.file.close()
+
+
+# 导入文件扩展名对应的读取类
+READERS = {'.xlsx': SheetReader, '.csv': CsvReader, '.parquet': ParquetReader}
+
+
+def open_reader(path, columns, parse):
+    """按扩展名打开导入文件(xlsx/csv/parquet)"""
+    suffix = Path(path).suffix.lower()
+    if suffix not in READERS:
+        raise ValueError(f"不支持的文件类型: {suffix}")
+    return READERS[suffix](path, columns, parse)
+
+
+async def stream_chunks(reader, write, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    工作线程读取解析导入文件，分批交给 write 写入(读取与写入通过有界队列并行)
+    参数:
+        write: 写入一批模型实例的协程函数
+        progress: 每批写入后调用的协程函数 progress(已解析行数, 已写入行数, 跳过行数)
+    返回: 写入的行数
+    """
+    queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    written = 0
+
+    async def read_chunks():
+        while True:
+            chunk = await asyncio.to_thread(reader.read_chunk, chunk_size)
+            if not chunk:
+                break
+            await queue.put(chunk)
+        await queue.put(None)
+
+    async def write_chunks():
+        nonlocal written
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                break
+            await write(chunk)
+            written += len(chunk)
+            if progress:
+                await progress(reader.parsed, written, reader.skipped)
+
+    await run_stages(read_chunks(), write_chunks())
+    return written
+
+
+def import_stats(reader, start, written, **counts):
+    """导入统计: 有效行数、写入行数、各类行数、跳过行、耗时、每秒行数、进程内存峰值"""
+    seconds = time.perf_counter() - start
+    rows = reader.parsed + reader.skipped
+    return {
+        "parsed": reader.parsed,
+        "written": written,
+        **counts,
+        "skipped": reader.skipped,
+        "skipped_rows": reader.skipped_rows,
+        "blank": reader.blank,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows / seconds) if seconds else rows,
+        # Linux 下 ru_maxrss 单位为KB
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+
+# LOAD DATA 文件中需要转义的字符
+LOAD_DATA_ESCAPES = str.maketrans({
+    '\\': '\\\\',
+    '\t': '\\t',
+    '\n': '\\n',
+    '\r': '\\r'
+})
+
+
+def load_data_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float):
+        return repr(value)
+    return str(value).translate(LOAD_DATA_ESCAPES)
+
+
+def write_load_file(chunk, fields):
+    """
+    一批模型实例写入临时文件(LOAD DATA 默认格式: 制表符分隔，\\N 表示NULL)
+    返回: 临时文件路径
+    """
+    fd, path = tempfile.mkstemp(suffix='.tsv')
+    with os.fdopen(fd, 'w', encoding='utf-8', newline='') as file:
+        for obj in chunk:
+            file.write('\t'.join(
+                load_data_value(getattr(obj, f)) for f in fields) + '\n')
+    return path
+
+
+async def local_infile_enabled(connection):
+    """是否用 LOAD DATA LOCAL INFILE 写入: 配置开启、MySQL且服务器允许 local_infile"""
+    if not config.MYSQL_LOCAL_INFILE:
+        return False
+    if connection.capabilities.dialect != "mysql":
+        return False
+    rows = await connection.execute_query_dict(
+        "SELECT @@GLOBAL.local_infile AS enabled")
+    if not rows or not rows[0]['enabled']:
+        print("MySQL未开启 local_infile，使用批量INSERT导入")
+        return False
+    return True
+
+
+def load_data_writer(connection, table, fields):
+    """
+    返回分批写入函数: 每批写入临时文件，再用 LOAD DATA LOCAL INFILE 导入 table
+    数据已经过校验，字段顺序为 fields
+    """
+    columns_sql = ', '.join(f"`{f}`" for f in fields)
+    sql = (f"LOAD DATA LOCAL INFILE %s INTO TABLE `{table}` "
+           f"CHARACTER SET utf8mb4 ({columns_sql})")
+
+    async def write(chunk):
+        path = await asyncio.to_thread(write_load_file, chunk, fields)
+        try:
+            await connection.execute_query(sql, [path])
+        finally:
+            await asyncio.to_thread(os.unlink, path)
+
+    return write
+
+
+async def import_excel(path,
+                       model,
+                       columns,
+                       parse,
+                       chunk_size=CHUNK_SIZE,
+                       progress=None):
+    """
+    流式导入文件(xlsx/csv/parquet): 工作线程读取解析 -> 分批写入
+    先删除表中所有数据，再在同一事务中分批写入，出错时整体回滚
+    MySQL开启 local_infile 且配置 MYSQL_LOCAL_INFILE 时用 LOAD DATA LOCAL INFILE 写入，
+    否则用 bulk_create
+    参数:
+        model: 模型类
+        columns: 需要的文件列(按顺序传给 parse)
+        parse: 行解析器 RowParser，数据无效时抛出 ValueError
+        progress: 进度回调，见 stream_chunks
+    返回: 导入统计(写入行数、写入方式、跳过行、耗时、每秒行数、进程内存峰值)
+    """
+    start = time.perf_counter()
+    reader = await asyncio.to_thread(open_reader, path, columns, parse)
+    try:
+        async with in_transaction() as connection:
+            await model.all().delete()
+            if await local_infile_enabled(connection):
+                loader = 'load_data'
+                write = load_data_writer(connection, model._meta.db_table,
+                                         parse.fields)
+                chunk_size = max(chunk_size, LOAD_DATA_CHUNK_SIZE)
+            else:
+                loader, write = 'bulk_create', model.bulk_create
+            created = await stream_chunks(reader, write, chunk_size, progress)
+    finally:
+        await asyncio.to_thread(reader.close)
+    return import_stats(reader,
+                        start,
+                        created,
+                        created=created,
+                        loader=loader)
+
+
+def mysql_connection():
+    """影子表切换使用 CREATE TABLE LIKE / RENAME TABLE，只支持MySQL"""
+    connection = connections.get("default")
+    if connection.capabilities.dialect != "mysql":
+        raise ValueError("影子表切换只支持MySQL数据库")
+    return connection
+
+
+async def swap_import_excel(path,
+                            model,
+                            columns,
+                            parse,
+                            fields,
+                            chunk_size=CHUNK_SIZE,
+                            progress=None):
+    """
+    影子表导入: 写入影子表(结构和索引与正式表相同)，写完后用一条 RENAME TABLE
+    原子地与正式表交换，查询在切换前后只会看到完整的旧数据或新数据；
+    旧数据保留为 表名_prev，可用 rollback_table 恢复
+    影子表名固定，调用方需持有 import_lock
+    参数:
+        fields: 写入的字段(id 由影子表自增生成)
+    返回: 导入统计
+    """
+    start = time.perf_counter()
+    connection = mysql_connection()
+    table = model._meta.db_table
+    shadow, previous = table + SHADOW_SUFFIX, table + PREVIOUS_SUFFIX
+    columns_sql = ', '.join(f"`{f}`" for f in fields)
+    values_sql = ', '.join(['%s'] * len(fields))
+    insert_sql = f"INSERT INTO `{shadow}` ({columns_sql}) VALUES ({values_sql})"
+
+    async def insert(chunk):
+        await connection.execute_many(
+            insert_sql, [[getattr(obj, f) for f in fields] for obj in chunk])
+
+    reader = await asyncio.to_thread(open_reader, path, columns, parse)
+    try:
+        await connection.execute_script(f"DROP TABLE IF EXISTS `{shadow}`")
+        await connection.execute_script(
+            f"CREATE TABLE `{shadow}` LIKE `{table}`")
+        if await local_infile_enabled(connection):
+            loader = 'load_data'
+            write = load_data_writer(connection, shadow, fields)
+            chunk_size = max(chunk_size, LOAD_DATA_CHUNK_SIZE)
+        else:
+            loader, write = 'insert', insert
+        created = await stream_chunks(reader, write, chunk_size, progress)
+        await connection.execute_script(f"DROP TABLE IF EXISTS `{previous}`")
+        await connection.execute_script(
+            f"RENAME TABLE `{table}` TO `{previous}`, `{shadow}` TO `{table}`")
+    except BaseException:
+        # 切换前出错时正式表不受影响，删除未完成的影子表
+        await connection.execute_script(f"DROP TABLE IF EXISTS `{shadow}`")
+        raise
+    finally:
+        await asyncio.to_thread(reader.close)
+    return import_stats(reader,
+                        start,
+                        created,
+                        created=created,
+                        loader=loader,
+                        previous=previous)
+
+
+async def rollback_table(model):
+    """
+    交换正式表与上一版本(表名_prev)，恢复到切换前的数据
+    再次调用会切换回来；replace/diff 方式导入后上一版本已删除，不能回滚
+    返回: 上一版本的表名
+    """
+    connection = mysql_connection()
+    table = model._meta.db_table
+    previous, temp = table + PREVIOUS_SUFFIX, table + SWAP_SUFFIX
+    async with import_lock(model):
+        rows = await connection.execute_query_dict("SHOW TABLES LIKE %s",
+                                                   [previous])
+        if not rows:
+            raise ValueError(f"没有可回滚的上一版本: {previous}")
+        await connection.execute_script(
+            f"RENAME TABLE `{table}` TO `{temp}`, `{previous}` TO `{table}`, "
+            f"`{temp}` TO `{previous}`")
+    return previous
+
+
+async def drop_previous(model):
+    """
+    删除上一版本(表名_prev): replace/diff 方式直接改写了正式表，
+    上一版本已不是这次导入前的数据，保留会让回滚恢复到更早的版本
+    """
+    table = model._meta.db_table + PREVIOUS_SUFFIX
+    await connections.get("default").execute_script(
+        f"DROP TABLE IF EXISTS `{table}`")
+
+
+@asynccontextmanager
+async def import_lock(model, wait=False):
+    """
+    持有表的导入锁(Redis)，同一张表的导入和回滚依次进行
+    参数:
+        wait: 锁被占用时是否等待(最长 IMPORT_LOCK_WAIT 秒)，否则立即失败
+    """
+    table = model._meta.db_table
+    client = aioredis.Redis(host=config.REDIS_HOST,
+                            port=config.REDIS_PORT,
+                            db=0)
+    try:
+        lock = client.lock(IMPORT_LOCK_NAME.format(table=table),
+                           timeout=IMPORT_LOCK_TIMEOUT)
+        if not await lock.acquire(blocking=wait,
+                                  blocking_timeout=IMPORT_LOCK_WAIT):
+            raise ValueError(f"{table} 正在导入或回滚，请稍后重试")
+        renew = asyncio.create_task(renew_import_lock(lock))
+        try:
+            yield
+        finally:
+            renew.cancel()
+            await asyncio.gather(renew, return_exceptions=True)
+            try:
+                await lock.release()
+            except LockError as e:
+                print(f"导入锁释放失败 {table}: {str(e)}")
+    finally:
+        await client.aclose()
+
+
+async def renew_import_lock(lock):
+    """导入期间定期把锁的过期时间重置为 IMPORT_LOCK_TIMEOUT"""
+    while True:
+        await asyncio.sleep(IMPORT_LOCK_RENEW_INTERVAL)
+        try:
+            await lock.reacquire()
+        except LockError as e:
+            print(f"导入锁续期失败 {lock.name}: {str(e)}")
+
+
+def diff_records(existing, incoming, key_index):
+    """
+    比较数据库记录和导入文件记录
+    参数:
+        existing: 数据库记录 [(id, 字段值...)]，按id排序
+        incoming: read_records 返回的 {自然键: 字段值元组}
+        key_index: 自然键字段在字段值中的位置
+    返回: (新增的字段值列表, 更新的 [(id, 字段值)], 删除的id列表, 未变化数量)
+    """
+    current, deletes = {}, []
+    for row in existing:
+        record_id, values = row[0], tuple(row[1:])
+        key = tuple(values[i] for i in key_index)
+        if key in current:
+            # 数据库中自然键重复的记录只保留id最小的一条
+            deletes.append(record_id)
+        else:
+            current[key] = (record_id, values)
+    inserts, updates, unchanged = [], [], 0
+    for key, values in incoming.items():
+        found = current.pop(key, None)
+        if found is None:
+            inserts.append(values)
+        elif found[1] != values:
+            updates.append((found[0], values))
+        else:
+            unchanged += 1
+    deletes.extend(record_id for record_id, _ in current.values())
+    return inserts, updates, deletes, unchanged
+
+
+async def diff_import_excel(path,
+                            model,
+                            columns,
+                            parse,
+                            key_fields,
+                            fields,
+                            chunk_size=CHUNK_SIZE,
+                            progress=None):
+    """
+    差异导入: 按自然键比较文件与数据库，只写入新增、变更和删除的记录
+    没有变化的记录保持原id，不会锁住或改写整张表
+    参数:
+        key_fields: 自然键字段
+        fields: 比较和写入的字段
+    返回: 变更统计(新增、更新、删除、未变化、跳过行、耗时、每秒行数、进程内存峰值)
+    """
+    start = time.perf_counter()
+    reader = await asyncio.to_thread(open_reader, path, columns, parse)
+    try:
+        incoming = await asyncio.to_thread(reader.read_records, key_fields,
+                                           fields)
+    finally:
+        await asyncio.to_thread(reader.close)
+    if progress:
+        await progress(reader.parsed, 0, reader.skipped)
+
+    existing = await model.all().order_by('id').values_list('id', *fields)
+    inserts, updates, deletes, unchanged = diff_records(
+        existing, incoming, [fields.index(f) for f in key_fields])
+    if inserts or updates or deletes:
+        async with in_transaction():
+            for i in range(0, len(deletes), chunk_size):
+                await model.filter(id__in=deletes[i:i + chunk_size]).delete()
+            for i in range(0, len(updates), chunk_size):
+                await model.bulk_update([
+                    model(id=record_id, **dict(zip(fields, values)))
+                    for record_id, values in updates[i:i + chunk_size]
+                ], fields=list(fields))
+            for i in range(0, len(inserts), chunk_size):
+                await model.bulk_create([
+                    model(**dict(zip(fields, values)))
+                    for values in inserts[i:i + chunk_size]
+                ])
+        if progress:
+            await progress(reader.parsed,
+                           len(inserts) + len(updates) + len(deletes),
+                           reader.skipped)
+
+    return import_stats(reader,
+                        start,
+                        len(inserts) + len(updates) + len(deletes),
+                        inserted=len(inserts),
+                        updated=len(updates),
+                        deleted=len(deletes),
+                        unchanged=unchanged)
+
+
+async def import_table(path, model, mode, chunk_size, progress, wait,
+                       columns, parse, key_fields, fields):
+    """
+    持有表的导入锁，按导入方式导入文件
+    replace/diff 方式改写了正式表时删除上一版本，rollback_table 不会恢复到过期数据
+    """
+    async with import_lock(model, wait):
+        if mode == 'swap':
+            return await swap_import_excel(path, model, columns, parse,
+                                           fields, chunk_size, progress)
+        if mode == 'diff':
+            stats = await diff_import_excel(path, model, columns, parse,
+                                            key_fields, fields, chunk_size,
+                                            progress)
+        else:
+            stats = await import_excel(path, model, columns, parse,
+                                       chunk_size, progress)
+        if mode != 'diff' or stats['written']:
+            await drop_previous(model)
+        return stats
+
+
+async def import_area_code_excel(path,
+                                 mode='replace',
+                                 chunk_size=CHUNK_SIZE,
+                                 progress=None,
+                                 wait=False):
+    """
+    导入物流分区文件(xlsx/csv/parquet)
+    参数:
+        mode: replace 删除全部后重新写入; diff 只写入有变化的记录;
+              swap 写入影子表后原子切换(MySQL)
+        progress: 进度回调 progress(已解析行数, 已写入行数, 跳过行数)
+        wait: 该表正在导入或回滚时是否等待，否则抛出 ValueError
+    """
+    return await import_table(path, AreaCode, mode, chunk_size, progress,
+                              wait, AREA_CODE_COLUMNS, parse_area_code,
+                              AREA_CODE_KEY, AREA_CODE_FIELDS)
+
+
+async def import_post_price_excel(path,
+                                  mode='replace',
+                                  chunk_size=CHUNK_SIZE,
+                                  progress=None,
+                                  wait=False):
+    """
+    导入物流价格文件(xlsx/csv/parquet)
+    参数:
+        mode: replace 删除全部后重新写入; diff 只写入有变化的记录;
+              swap 写入影子表后原子切换(MySQL)
+        progress: 进度回调 progress(已解析行数, 已写入行数, 跳过行数)
+        wait: 该表正在导入或回滚时是否等待，否则抛出 ValueError
+    """
+    return await import_table(path, PostPrice, mode, chunk_size, progress,
+                              wait, POST_PRICE_COLUMNS, parse_post_price,
+                              POST_PRICE_KEY, POST_PRICE_FIELDS)
@@ -0,0 +1,156 @@
+import hashlib
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import redis
+
+from apps.logistic.importer import (import_area_code_excel,
+                                    import_post_price_excel)
+from apps.logistic.models import ImportJob
+from config import config
+
+UPLOAD_DIR = Path("media/upload")  # 上传文件保存目录(文件名为内容哈希)
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 上传文件每次读取的字节数
+# 可导入的表
+IMPORT_TABLES = {
+    'area_code': import_area_code_excel,
+    'post_price': import_post_price_excel
+}
+# Redis中的导入进度(导入在事务中进行，进度不写数据库)
+PROGRESS_KEY = "logistic:import:progress:{job_id}"
+PROGRESS_TTL = 24 * 60 * 60  # 进度数据保留时间(秒)
+PROGRESS_INTERVAL = 1  # 进度更新最短间隔(秒)
+PROGRESS_FIELDS = ('rows_parsed', 'rows_written', 'rows_skipped',
+                   'rows_per_sec')
+# 创建超过该时间仍未结束的任务视为已中断(如worker崩溃)，不再用于去重
+JOB_STALE_SECONDS = 6 * 60 * 60
+
+
+def save_upload(source, suffix):
+    """
+    将上传文件分块写入 UPLOAD_DIR 下的临时文件，同时计算sha256
+    参数:
+        source: 上传文件对象(二进制)
+        suffix: 文件扩展名
+    返回: (临时文件路径, sha256, 文件大小)
+    """
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(suffix=suffix, dir=UPLOAD_DIR)
+    try:
+        with os.fdopen(fd, 'wb') as target:
+            while chunk := source.read(UPLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+                target.write(chunk)
+                size += len(chunk)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return temp_path, digest.hexdigest(), size
+
+
+def store_upload(temp_path, sha256, suffix):
+    """临时文件改名为 哈希+扩展名，返回保存路径"""
+    path = UPLOAD_DIR / f"{sha256}{suffix}"
+    os.replace(temp_path, path)
+    return path
+
+
+def get_redis():
+    return redis.Redis(host=config.REDIS_HOST,
+                       port=config.REDIS_PORT,
+                       db=0,
+                       socket_timeout=2,
+                       socket_connect_timeout=2)
+
+
+def get_progress(job_id):
+    """
+    读取导入任务的实时进度
+    返回: {rows_parsed, rows_written, rows_skipped, rows_per_sec}，没有进度时返回None
+    """
+    data = get_redis().hgetall(PROGRESS_KEY.format(job_id=job_id))
+    if not data:
+        return None
+    return {
+        field: float(data[field.encode()])
+        if field == 'rows_per_sec' else int(data[field.encode()])
+        for field in PROGRESS_FIELDS if field.encode() in data
+    }
+
+
+async def find_duplicate_job(sha256, table, mode):
+    """
+    相同文件内容、表和导入方式正在等待或运行的任务
+    已结束的任务不参与去重(表数据可能已变化，需要允许重新导入)，
+    超过 JOB_STALE_SECONDS 的未结束任务视为已中断
+    """
+    cutoff = datetime.now() - timedelta(seconds=JOB_STALE_SECONDS)
+    return await ImportJob.filter(sha256=sha256,
+                                  table=table,
+                                  mode=mode,
+                                  status__in=("pending", "running"),
+                                  create_time__gte=cutoff).order_by(
+                                      '-id').first()
+
+
+async def run_import_job(job_id):
+    """
+    执行导入任务(Celery worker中运行)，进度每秒写入Redis，结束时写入任务表
+    返回: 任务状态和导入统计
+    """
+    job = await ImportJob.get(id=job_id)
+    job.status = "running"
+    job.start_time = datetime.now()
+    await job.save(update_fields=['status', 'start_time'])
+    start = time.monotonic()
+    client = get_redis()
+    key = PROGRESS_KEY.format(job_id=job_id)
+    last_update = 0.0
+
+    async def progress(parsed, written, skipped):
+        nonlocal last_update
+        now = time.monotonic()
+        if now - last_update < PROGRESS_INTERVAL:
+            return
+        last_update = now
+        try:
+            client.hset(key,
+                        mapping={
+                            'rows_parsed': parsed,
+                            'rows_written': written,
+                            'rows_skipped': skipped,
+                            'rows_per_sec':
+                            round((parsed + skipped) / (now - start), 1)
+                        })
+            client.expire(key, PROGRESS_TTL)
+        except redis.RedisError as e:
+            print(f"导入进度写入Redis失败: {str(e)}")
+
+    try:
+        # 同一张表的其他导入或回滚完成后再导入
+        stats = await IMPORT_TABLES[job.table](job.file_path,
+                                               job.mode,
+                                               progress=progress,
+                                               wait=True)
+    except Exception as e:
+        job.status = "failed"
+        job.message = f"导入失败: {str(e)}"[:500]
+        job.finish_time = datetime.now()
+        await job.save(update_fields=['status', 'message', 'finish_time'])
+        return {"status": "failed", "message": job.message}
+
+    job.status = "success"
+    job.rows_parsed = stats['parsed']
+    job.rows_written = stats['written']
+    job.rows_skipped = stats['skipped']
+    job.rows_per_sec = stats['rows_per_sec']
+    job.result = stats
+    job.message = "导入成功"
+    job.finish_time = datetime.now()
+    await job.save()
+    return {"status": "success", "result": stats}
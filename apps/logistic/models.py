@@ -22,6 +22,7 @@ class AreaCode(Model):
     class Meta:
         table = "area_code"
         table_description = "物流分区表"
+        indexes = (("country_code", "post_code"), )
 
 
 # 物流价格
@@ -50,3 +51,44 @@ class PostPrice(Model):
     class Meta:
         table = "post_price"
         table_description = "物流价格表"
+        indexes = (("carrier_code", "area", "min_weight", "max_weight"), )
+
+
+# 物流数据导入任务
+class ImportJob(Model):
+    id = fields.IntField(pk=True)
+    table = fields.CharField(max_length=20,
+                             description="导入的表(area_code/post_price)")
+    mode = fields.CharField(max_length=10,
+                            description="导入方式(replace/diff/swap)")
+    file_name = fields.CharField(max_length=200, description="上传的文件名")
+    file_path = fields.CharField(max_length=300, description="保存的文件路径")
+    file_size = fields.BigIntField(default=0, description="文件大小(字节)")
+    sha256 = fields.CharField(max_length=64,
+                              index=True,
+                              description="文件内容哈希")
+    status = fields.CharField(max_length=20,
+                              default="pending",
+                              description="状态(pending/running/success/failed)")
+    task_id = fields.CharField(max_length=50,
+                               null=True,
+                               description="Celery任务ID")
+    rows_parsed = fields.IntField(default=0, description="已解析行数")
+    rows_written = fields.IntField(default=0, description="已写入行数")
+    rows_skipped = fields.IntField(default=0, description="跳过的无效行数")
+    rows_per_sec = fields.FloatField(null=True, description="每秒处理行数")
+    result = fields.JSONField(null=True, description="导入统计")
+    message = fields.CharField(max_length=500,
+                               null=True,
+                               description="结果信息")
+    create_time = fields.DatetimeField(auto_now_add=True,
+                                       description="创建时间")
+    start_time = fields.DatetimeField(null=True, description="开始时间")
+    finish_time = fields.DatetimeField(null=True, description="完成时间")
+
+    def __str__(self):
+        return self.file_name
+
+    class Meta:
+        table = "import_job"
+        table_description = "物流数据导入任务表"
@@ -0,0 +1,194 @@
+import json
+import time
+from collections import OrderedDict
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+from config import config
+from apps.logistic.zones import ZONE_FIELDS, normalize_post_code
+
+# Redis中的运费缓存
+QUOTE_KEY = "logistic:quote:{zone}:{rate}:{country}:{post_code}:{bracket}"
+
+
+class QuoteCache:
+    """
+    运费查询缓存
+    缓存 (国家, 邮编, 重量区间) 对应的分区渠道和价格参数，运费仍按订单实际重量计算
+    - 一级缓存: 进程内LRU，超过TTL的记录视为不存在
+    - 二级缓存: Redis(多个进程共享)，Redis不可用时只使用进程内缓存
+    键中包含分区索引和运费表的数据摘要，重新导入后旧记录不会再命中
+    """
+
+    def __init__(self, maxsize, ttl, use_redis=True):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.use_redis = use_redis
+        self._entries = OrderedDict()  # {键: (过期时间, 分区价格)}
+        self._redis = None
+        self._redis_failed_at = 0.0
+        self.hits = 0  # 进程内缓存命中
+        self.redis_hits = 0  # Redis命中
+        self.misses = 0
+        self.evictions = 0  # 超出容量淘汰
+        self.expirations = 0  # 过期淘汰
+
+    def _get_redis(self):
+        # Redis出错后30秒内不再重试，避免每个请求都等待连接超时
+        if not self.use_redis:
+            return None
+        if self._redis is None and time.monotonic(
+        ) - self._redis_failed_at > 30:
+            self._redis = aioredis.Redis(host=config.REDIS_HOST,
+                                         port=config.REDIS_PORT,
+                                         db=0,
+                                         socket_timeout=1,
+                                         socket_connect_timeout=1)
+        return self._redis
+
+    def _redis_error(self, e):
+        print(f"运费缓存Redis不可用，只使用进程内缓存: {str(e)}")
+        self._redis = None
+        self._redis_failed_at = time.monotonic()
+
+    def _get_local(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _put_local(self, key, value, now):
+        self._entries[key] = (now + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_many(self, keys):
+        """
+        批量读取缓存，先查进程内缓存，未命中的再一次性查询Redis
+        返回: {键: 分区价格}，不包含未命中的键
+        """
+        now = time.monotonic()
+        found, remote = {}, []
+        for key in keys:
+            value = self._get_local(key, now)
+            if value is None:
+                remote.append(key)
+            else:
+                found[key] = value
+        self.hits += len(found)
+        client = self._get_redis() if remote else None
+        if client is not None:
+            try:
+                values = await client.mget(remote)
+            except (RedisError, OSError) as e:
+                self._redis_error(e)
+                values = []
+            for key, data in zip(remote, values):
+                if data is None:
+                    continue
+                found[key] = loads(data)
+                self._put_local(key, found[key], now)
+                self.redis_hits += 1
+        self.misses += len(keys) - len(found)
+        return found
+
+    async def put_many(self, items):
+        """批量写入进程内缓存和Redis"""
+        now = time.monotonic()
+        for key, value in items.items():
+            self._put_local(key, value, now)
+        client = self._get_redis() if items else None
+        if client is None:
+            return
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    pipe.set(key, dumps(value), ex=self.ttl)
+                await pipe.execute()
+        except (RedisError, OSError) as e:
+            self._redis_error(e)
+
+    def clear(self):
+        """清空进程内缓存(Redis中的旧记录因键中的数据摘要改变而不再命中，到期自动删除)"""
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.redis_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "redis": self.use_redis,
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.redis_hits) /
+                              lookups, 4) if lookups else 0,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
+def dumps(zone_rates):
+    """分区价格转为JSON: [[name, area, is_service, ship_code, basic_price, calc_price]]"""
+    return json.dumps([[zone[f] for f in ZONE_FIELDS] +
+                       list(price or (None, None))
+                       for zone, price in zone_rates],
+                      ensure_ascii=False)
+
+
+def loads(data):
+    zone_rates = []
+    for row in json.loads(data):
+        zone = dict(zip(ZONE_FIELDS, row[:4]))
+        price = None if row[4] is None else (row[4], row[5])
+        zone_rates.append((zone, price))
+    return zone_rates
+
+
+def cache_key(zone_index, rate_table, country_code, post_code, weight):
+    return QUOTE_KEY.format(zone=zone_index.digest,
+                            rate=rate_table.digest,
+                            country=normalize_post_code(country_code),
+                            post_code=normalize_post_code(post_code),
+                            bracket=rate_table.bracket(weight))
+
+
+quote_cache = QuoteCache(maxsize=config.QUOTE_CACHE_SIZE,
+                         ttl=config.QUOTE_CACHE_TTL,
+                         use_redis=config.QUOTE_CACHE_REDIS)
+
+
+async def get_zone_rates(requests, zone_index, rate_table):
+    """
+    查询订单的分区渠道和价格参数(使用运费缓存)
+    参数:
+        requests: [(国家二字码, 邮编, 重量)]
+    返回: 每个订单的 [(分区渠道, 价格)]，价格为 (basic_price, calc_price)，
+          没有匹配的价格时为None
+    """
+    keys = [
+        cache_key(zone_index, rate_table, country_code, post_code, weight)
+        for country_code, post_code, weight in requests
+    ]
+    found = await quote_cache.get_many(list(dict.fromkeys(keys)))
+    missing = {}
+    for key, (country_code, post_code, weight) in zip(keys, requests):
+        if key in found or key in missing:
+            continue
+        missing[key] = [(zone,
+                         rate_table.find(zone['ship_code'], zone['area'],
+                                         weight))
+                        for zone in zone_index.lookup(country_code, post_code)]
+    if missing:
+        await quote_cache.put_many(missing)
+        found.update(missing)
+    return [found[key] for key in keys]
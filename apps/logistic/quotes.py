@@ -0,0 +1,69 @@
+# 固定渠道(不按邮编分区)
+ENVELOPE_CHANNEL = {
+    'name': '信封',
+    'area': None,
+    'is_service': True,
+    'ship_code': 'ZMAU-L'
+}
+GB_GENERAL_CHANNEL = {
+    'name': '联邮通(普货)',
+    'area': None,
+    'is_service': True,
+    'ship_code': '4PX_WBP'
+}
+
+
+def quote_options(zone_rates,
+                  country_code,
+                  weight,
+                  rate_table,
+                  list_page=True):
+    """
+    根据分区渠道和价格参数计算订单各渠道运费
+    英国添加联邮通(普货)、澳大利亚添加信封的渠道规则只在这里实现，
+    订单列表页、客服页(配合运费缓存)和批量报价都通过该函数计算
+    参数:
+        zone_rates: get_zone_rates 返回的单个订单 [(分区渠道, 价格)]
+        list_page: 订单列表页规则(英国添加联邮通(普货)，重量为0时运费记为0)；
+                   否则为客服页规则
+    返回: 渠道运费列表(name/area/is_service/ship_code/postage)，按运费从低到高排序
+    """
+    channels = [(zone, price, list_page) for zone, price in zone_rates]
+    if list_page and country_code == 'GB':
+        channels.insert(0, (GB_GENERAL_CHANNEL,
+                            rate_table.find(GB_GENERAL_CHANNEL['ship_code'],
+                                            None, weight), False))
+    if country_code == 'AU':
+        channels.append((ENVELOPE_CHANNEL,
+                         rate_table.find(ENVELOPE_CHANNEL['ship_code'], None,
+                                         weight), list_page))
+    options = [{
+        **channel, 'postage':
+        rate_table.postage(price, weight) if weight or not zero else 0
+    } for channel, price, zero in channels]
+    options.sort(key=lambda x: x['postage'])
+    return options
+
+
+def quote_orders(orders, zone_index, rate_table):
+    """
+    批量报价(订单列表页规则): 相同国家和邮编只查询一次分区渠道，
+    渠道规则与运费计算和 quote_options 一致
+    参数:
+        orders: [(国家二字码, 邮编, 重量)]
+    返回: 每个订单的渠道运费列表(name/area/is_service/ship_code/postage)，
+          按运费从低到高排序
+    """
+    zones_by_post_code = {}
+    results = []
+    for country_code, post_code, weight in orders:
+        zones = zones_by_post_code.get((country_code, post_code))
+        if zones is None:
+            zones = zones_by_post_code[(country_code, post_code)] = \
+                zone_index.lookup(country_code, post_code)
+        zone_rates = [(zone,
+                       rate_table.find(zone['ship_code'], zone['area'],
+                                       weight)) for zone in zones]
+        results.append(
+            quote_options(zone_rates, country_code, weight, rate_table))
+    return results
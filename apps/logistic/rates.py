@@ -0,0 +1,138 @@
+import asyncio
+import bisect
+import hashlib
+from datetime import datetime
+
+from apps.logistic.models import PostPrice
+
+# 运费计算用到的物流价格字段
+RATE_FIELDS = ('id', 'carrier_code', 'area', 'min_weight', 'max_weight',
+               'basic_price', 'calc_price')
+
+
+class RateTable:
+    """
+    内存运费表
+    按 (物流渠道代码, 区域) 分组，每组的重量区间拆分为互不重叠的基本区间，
+    查询时用 bisect 定位重量所在区间；
+    区间重叠时取id最小的价格记录(与原 .first() 查询结果一致)
+    重量按整数克计算，区间 [min_weight, max_weight] 包含两端
+    """
+
+    def __init__(self, rows, version=1):
+        self.version = version  # 每次重新加载加1
+        self.digest = self._digest(rows)  # 价格数据摘要，内容相同则相同
+        self.rows = len(rows)
+        self.loaded_at = datetime.now()
+        grouped = {}
+        for row in rows:
+            if row['min_weight'] is None or row['max_weight'] is None:
+                continue
+            grouped.setdefault((row['carrier_code'], row['area']),
+                               []).append(row)
+        # {(carrier_code, area): (区间起点列表, 价格列表)}
+        self.groups = {
+            key: self._build_segments(group)
+            for key, group in grouped.items()
+        }
+        # 所有渠道的区间起点，相邻起点之间的重量在每个渠道都落在同一区间
+        self.boundaries = sorted({
+            start
+            for starts, _ in self.groups.values() for start in starts
+        })
+
+    @staticmethod
+    def _digest(rows):
+        content = repr(sorted(tuple(row[f] for f in RATE_FIELDS)
+                              for row in rows)).encode('utf-8')
+        return hashlib.blake2b(content, digest_size=8).hexdigest()
+
+    @staticmethod
+    def _build_segments(rows):
+        """
+        将一组重量区间拆分为基本区间
+        返回: (区间起点列表, 价格列表)，价格为 (basic_price, calc_price) 或
+              None(该区间没有价格)
+        """
+        points = sorted({row['min_weight'] for row in rows}
+                        | {row['max_weight'] + 1 for row in rows})
+        starts, prices = [], []
+        for start in points:
+            best = None
+            for row in rows:
+                if row['min_weight'] <= start <= row['max_weight'] and (
+                        best is None or row['id'] < best['id']):
+                    best = row
+            price = (best['basic_price'],
+                     best['calc_price']) if best else None
+            # 相邻区间价格相同时合并
+            if prices and prices[-1] == price:
+                continue
+            starts.append(start)
+            prices.append(price)
+        return starts, prices
+
+    def find(self, carrier_code, area, weight):
+        """
+        查找重量对应的价格
+        返回: (basic_price, calc_price)，没有匹配的价格时返回None
+        """
+        group = self.groups.get((carrier_code, area))
+        if group is None:
+            return None
+        starts, prices = group
+        index = bisect.bisect_right(starts, weight) - 1
+        return prices[index] if index >= 0 else None
+
+    def bracket(self, weight):
+        """
+        重量所在的全局区间序号
+        序号相同的重量在所有渠道使用相同的价格记录
+        """
+        return bisect.bisect_right(self.boundaries, weight)
+
+    def quote(self, area, weight, carrier_code):
+        """
+        计算运费: calc_price * weight / 1000 + basic_price
+        没有匹配的价格时返回0
+        """
+        return self.postage(self.find(carrier_code, area, weight), weight)
+
+    @staticmethod
+    def postage(price, weight):
+        """
+        按价格参数计算运费
+        参数:
+            price: find 返回的 (basic_price, calc_price)，None时运费为0
+        """
+        if price is None:
+            return 0
+        basic_price, calc_price = price
+        return round((calc_price * weight / 1000) + basic_price, 2)
+
+
+_table = None
+_lock = asyncio.Lock()
+
+
+async def load_rate_table(only_if_missing=False):
+    """
+    从数据库重新加载运费表(导入物流价格后调用)
+    参数:
+        only_if_missing: 仅在尚未加载时加载
+    返回: 当前运费表
+    """
+    global _table
+    async with _lock:
+        if only_if_missing and _table is not None:
+            return _table
+        rows = await PostPrice.all().order_by('id').values(*RATE_FIELDS)
+        _table = RateTable(rows, version=_table.version + 1 if _table else 1)
+        return _table
+
+
+async def get_rate_table():
+    """获取当前运费表，首次使用时从数据库加载"""
+    if _table is None:
+        return await load_rate_table(only_if_missing=True)
+    return _table
@@ -0,0 +1,10 @@
+from celery_app import celery_app, run_async
+
+from apps.logistic.jobs import run_import_job
+
+
+# 物流分区/价格导入任务(上传的文件)
+@celery_app.task
+def import_job_task(job_id):
+    result = run_async(run_import_job(job_id))
+    return result
@@ -0,0 +1,139 @@
+import asyncio
+import bisect
+import hashlib
+import re
+from datetime import datetime
+
+from apps.logistic.models import AreaCode
+
+# 分区查询返回的字段(与原 AreaCode.filter(...).values(...) 一致)
+ZONE_FIELDS = ('name', 'area', 'is_service', 'ship_code')
+# 邮编由 外向码 + 3位内向码 组成的国家，分区按外向码或其字母前缀定义
+OUTWARD_CODE_COUNTRIES = {'GB', 'UK', 'JE', 'GG', 'IM'}
+OUTWARD_LETTERS_RE = re.compile(r'[A-Z]*')
+
+
+def normalize_post_code(post_code):
+    """统一邮编格式: 去除空格并转为大写"""
+    if post_code is None:
+        return ''
+    return str(post_code).replace(' ', '').strip().upper()
+
+
+def outward_codes(post_code):
+    """
+    英国类邮编的候选分区代码: 外向码、外向码的字母前缀
+    如 SW1A1AA -> ['SW1A', 'SW']，只有外向码时 SW1A -> ['SW1A', 'SW']
+    """
+    outward = post_code[:-3] if len(post_code) >= 5 else post_code
+    letters = OUTWARD_LETTERS_RE.match(outward).group()
+    if letters and letters != outward:
+        return [outward, letters]
+    return [outward]
+
+
+class ZoneIndex:
+    """
+    内存邮编分区索引
+    按 (国家二字码, 标准化邮编) 查找物流分区，同一邮编的多条分区保持id顺序
+    邮编没有精确匹配的渠道时，再依次使用:
+    - 范围匹配: 分区邮编写作 起始-结束(如 2000-2999)
+    - 前缀匹配: 只用于分区按邮编前缀定义的国家(OUTWARD_CODE_COUNTRIES)，
+      分区邮编为外向码或其字母前缀(如 SW1A 或 SW)，优先使用外向码；
+      其他国家输错的邮编不按前缀匹配，避免报出错误分区的价格
+    """
+
+    def __init__(self, rows, version=1):
+        self.version = version  # 每次重新加载加1
+        self.digest = self._digest(rows)  # 分区数据摘要，内容相同则相同
+        self.rows = len(rows)
+        self.loaded_at = datetime.now()
+        self.exact = {}  # {(国家, 邮编): [分区]}
+        self.ranges = {}  # {国家: [(起始, 结束, 分区)]}，按起始排序
+        self.range_starts = {}  # {国家: [起始]}
+        for row in rows:
+            country = normalize_post_code(row['country_code'])
+            post_code = normalize_post_code(row['post_code'])
+            zone = {field: row[field] for field in ZONE_FIELDS}
+            start, sep, end = post_code.partition('-')
+            if sep and start and end and len(start) == len(end):
+                self.ranges.setdefault(country, []).append((start, end, zone))
+                continue
+            self.exact.setdefault((country, post_code), []).append(zone)
+        for country, ranges in self.ranges.items():
+            ranges.sort(key=lambda r: r[0])
+            self.range_starts[country] = [r[0] for r in ranges]
+
+    @staticmethod
+    def _digest(rows):
+        # 同一邮编的分区按id顺序返回，摘要保留行顺序
+        content = repr([
+            tuple(row[f] for f in ('country_code', 'post_code', *ZONE_FIELDS))
+            for row in rows
+        ]).encode('utf-8')
+        return hashlib.blake2b(content, digest_size=8).hexdigest()
+
+    def _range_zones(self, country, post_code):
+        ranges = self.ranges.get(country)
+        if not ranges:
+            return []
+        # 起始 <= 邮编 的范围中，筛选 结束 >= 邮编 且长度相同的
+        index = bisect.bisect_right(self.range_starts[country], post_code)
+        return [
+            zone for start, end, zone in ranges[:index]
+            if len(start) == len(post_code) and post_code <= end
+        ]
+
+    def _prefix_zones(self, country, post_code):
+        if country not in OUTWARD_CODE_COUNTRIES:
+            return []
+        for candidate in outward_codes(post_code):
+            zones = self.exact.get((country, candidate))
+            if zones:
+                return zones
+        return []
+
+    def lookup(self, country_code, post_code):
+        """
+        查询邮编对应的物流分区
+        返回: 新的分区列表(可追加)，元素为 name/area/is_service/ship_code 字典(只读)
+        """
+        country = normalize_post_code(country_code)
+        code = normalize_post_code(post_code)
+        zones = list(self.exact.get((country, code), []))
+        # 精确匹配未覆盖的渠道，使用范围或前缀匹配补充
+        covered = {zone['ship_code'] for zone in zones}
+        for zone in self._range_zones(country, code) + self._prefix_zones(
+                country, code):
+            if zone['ship_code'] not in covered:
+                zones.append(zone)
+                covered.add(zone['ship_code'])
+        return zones
+
+
+_index = None
+_lock = asyncio.Lock()
+
+
+async def load_zone_index(only_if_missing=False):
+    """
+    从数据库重新加载邮编分区索引(导入物流分区后调用)
+    参数:
+        only_if_missing: 仅在尚未加载时加载
+    返回: 当前分区索引
+    """
+    global _index
+    async with _lock:
+        if only_if_missing and _index is not None:
+            return _index
+        rows = await AreaCode.all().order_by('id').values(
+            'country_code', 'post_code', *ZONE_FIELDS)
+        _index = ZoneIndex(rows, version=_index.version + 1 if _index else 1)
+        return _index
+
+
+async def get_zone_index():
+    """获取当前分区索引，首次使用时从数据库加载"""
+    if _index is None:
+        return await load_zone_index(only_if_missing=True)
+    return _index
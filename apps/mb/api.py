@@ -4,21 +4,34 @@ from typing import List
 from decimal import Decimal
 import pytz
 from datetime import datetime
-from apps.mb.models import Orders, OrderItems
-from apps.logistic.models import AreaCode, PostPrice
+from apps.mb.models import Orders, OrderItems, SyncState
+from apps.logistic.rates import get_rate_table
+from apps.logistic.zones import get_zone_index
+from apps.logistic.quotes import quote_options
+from apps.logistic.quote_cache import get_zone_rates
 from apps.mb.schemas import OrdersForm
 from fastapi.templating import Jinja2Templates
-from pathlib import Path
-import json
 
 from celery_app import celery_app
 from celery.result import AsyncResult
-from apps.mb.tasks import get_orders_task
+from apps.mb.tasks import get_orders_task, get_orders_range_task
+from apps.mb.limiter import get_metrics
+from apps.mb.credentials import get_token, save_cookie
+from redis import RedisError
+import asyncio
 
 templates = Jinja2Templates(directory="templates")  # 添加模板配置
 
 router = APIRouter()
 
+# 订单接口返回的渠道运费字段(保持原接口格式，不返回 ship_code)
+POST_FIELDS = ('name', 'area', 'is_service', 'postage')
+
+
+def post_fields(options):
+    """quote_options 的渠道运费列表只保留 POST_FIELDS"""
+    return [{field: option[field] for field in POST_FIELDS} for option in options]
+
 
 @router.get("/orders/", response_model=List[OrdersForm], summary="获取订单数据100条")
 async def get_all_orders():
@@ -92,18 +105,51 @@ async def sync_orders(request: Request,
     参数:
         start_time: 开始时间 (格式: YYYY-MM-DD HH:MM:SS)
         end_time: 结束时间 (格式: YYYY-MM-DD HH:MM:SS)
+        split_by: 可选，day/hour，按天/小时拆分为多个子任务并行同步
+        force: 可选，拆分同步时是否重跑已完成的时间窗口
     """
     start_time = time_range.get("start_time")
     end_time = time_range.get("end_time")
+    split_by = time_range.get("split_by")
 
     if not start_time or not end_time:
         raise HTTPException(status_code=400,
                             detail="必须提供start_time和end_time参数")
+    if split_by and split_by not in ("day", "hour"):
+        raise HTTPException(status_code=400, detail="split_by只支持day或hour")
 
-    task = get_orders_task.delay(start_time, end_time)
+    if split_by:
+        task = get_orders_range_task.delay(start_time, end_time, split_by,
+                                           bool(time_range.get("force")))
+    else:
+        task = get_orders_task.delay(start_time, end_time)
     return {"status": "started", "task_id": task.id}
 
 
+@router.get("/sync_state/", summary="获取订单同步状态")
+async def get_sync_state():
+    """
+    获取各订单同步任务的付款时间水位和最近运行结果
+    """
+    return await SyncState.all().values('name', 'last_paid_time',
+                                        'last_run_time', 'status', 'message')
+
+
+@router.get("/erp_metrics/", summary="获取ERP请求监控数据")
+async def get_erp_metrics(minutes: int = 5):
+    """
+    获取最近几分钟的ERP请求速率、错误率、平均等待时间和当前并发上限
+    参数:
+        minutes: 统计的分钟数，默认5分钟
+    """
+    if minutes < 1 or minutes > 120:
+        raise HTTPException(status_code=400, detail="minutes 取值范围为1-120")
+    try:
+        return await asyncio.to_thread(get_metrics, minutes)
+    except RedisError as e:
+        raise HTTPException(status_code=503, detail=f"Redis不可用: {str(e)}")
+
+
 @router.get("/celery/tasks/", summary="获取所有Celery任务状态")
 async def get_all_celery_tasks(limit_completed: int = 10):
     """
@@ -209,10 +255,8 @@ async def get_mb_token():
     """
     获取mb_token.json文件中的cookie和update_time
     """
-    config_path = Path(__file__).parent.parent.parent / "mb_token.json"
-    with open(config_path, 'r') as f:
-        config = json.load(f)
-    return {"cookie": config["cookie"], "update_time": config["update_time"]}
+    token = await asyncio.to_thread(get_token)
+    return {"cookie": token["cookie"], "update_time": token["update_time"]}
 
 
 @router.post("/update_cookie/", summary="更新mbtoken")
@@ -222,19 +266,7 @@ async def update_cookie(c_value: str = Body(..., embed=True)):
     参数:
         c_value: 新的cookie值
     """
-    config_path = Path(__file__).parent.parent.parent / "mb_token.json"
-
-    # 读取现有配置
-    with open(config_path, 'r') as f:
-        config = json.load(f)
-
-    # 更新配置
-    config["cookie"] = c_value
-    config["update_time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    # 写回文件
-    with open(config_path, 'w') as f:
-        json.dump(config, f, indent=4)
+    await asyncio.to_thread(save_cookie, c_value)
 
     return {"status": "success", "message": "cookie更新成功"}
 
@@ -248,44 +280,38 @@ async def get_order_info(order_nums: List = Body(..., embed=True)):
     """
     order_list = []
     if order_nums:
-        for order_num in order_nums:
-            order = await Orders.get_or_none(order_number=order_num)
-            if not order:
-                continue
-            order_items = await OrderItems.filter(order=order).values(
-                'item_cost', 'sku', 'platform_property')
-            # 获取邮编分区
-            area_list = await AreaCode.filter(
-                country_code=order.country_code,
-                post_code=order.post_code).values('name', 'area', 'is_service',
-                                                  'ship_code')
-            # 添加信封渠道
-            if order.country_code == 'AU':
-                area_list.append({
-                    'name': '信封',
-                    'area': None,
-                    'is_service': True,
-                    'ship_code': 'ZMAU-L'
-                })
-            post_list = []
-            for i in area_list:
-                postage = await calc_post_price(i['area'],
-                                                int(order.order_weight),
-                                                i['ship_code'])
-                post_list.append({
-                    'name': i['name'],
-                    'area': i['area'],
-                    'is_service': i['is_service'],
-                    'postage': postage
-                })
-
-            # 按postage从小到大排序
-            post_list.sort(key=lambda x: x['postage'])
+        # 一次查询所有订单和订单商品，查询次数与订单数量无关
+        orders = {}
+        for order in await Orders.filter(
+                order_number__in=set(order_nums)).order_by('id'):
+            orders.setdefault(order.order_number, order)
+        items = {}
+        for item in await OrderItems.filter(
+                order_id__in=[o.id for o in orders.values()]).order_by(
+                    'id').values('order_id', 'item_cost', 'sku',
+                                 'platform_property'):
+            items.setdefault(item.pop('order_id'), []).append(item)
+        # 分区渠道和价格参数使用运费缓存
+        found = [orders[n] for n in order_nums if n in orders]
+        quote_requests = [(order.country_code, order.post_code,
+                           int(order.order_weight)) for order in found]
+        zone_index = await get_zone_index()
+        rate_table = await get_rate_table()
+        zone_rates = await get_zone_rates(quote_requests, zone_index,
+                                          rate_table)
+        for order, (country_code, _, weight), rates in zip(
+                found, quote_requests, zone_rates):
+            post_list = post_fields(
+                quote_options(rates,
+                              country_code,
+                              weight,
+                              rate_table,
+                              list_page=False))
             order_list.append({
                 'order_number': order.order_number,
                 'postage_out_rmb': order.postage_out_rmb,
                 'profit_rmb': round(float(order.profit_rmb), 2),
-                'order_items': order_items,
+                'order_items': items.get(order.id, []),
                 'post_list': post_list
             })
 
@@ -307,8 +333,8 @@ async def get_order_list_info(orders: List = Body(...)):
     """
     order_list = []
     if orders:
+        quote_requests = []
         for od in orders:
-            order_num = od.get('orderNumber', '')
             country = od.get('country', '')
             country_code = 'AU' if country == '澳大利亚' else 'GB' if country == '英国' else ''
             post_code = od.get('postCode', '')
@@ -316,72 +342,20 @@ async def get_order_list_info(orders: List = Body(...)):
                 weight = int(od.get('weight', 0))
             except (ValueError, TypeError):
                 weight = 0
-
-            # 获取邮编分区
-            area_list = await AreaCode.filter(country_code=country_code,
-                                              post_code=post_code).values(
-                                                  'name', 'area', 'is_service',
-                                                  'ship_code')
-            # 添加信封渠道
-            if country_code == 'AU':
-                area_list.append({
-                    'name': '信封',
-                    'area': None,
-                    'is_service': True,
-                    'ship_code': 'ZMAU-L'
-                })
-            post_list = []
-            # 英国添加联邮通(普货)渠道
-            if country_code == 'GB':
-                post_list.append({
-                    'name':
-                    '联邮通(普货)',
-                    'area':
-                    None,
-                    'is_service':
-                    True,
-                    'postage':
-                    await calc_post_price(None, weight, '4PX_WBP')
-                })
-            for i in area_list:
-                postage = await calc_post_price(i['area'], weight,
-                                                i['ship_code'])
-                post_list.append({
-                    'name': i['name'],
-                    'area': i['area'],
-                    'is_service': i['is_service'],
-                    'postage': postage if weight else 0
-                })
-
-            # 按postage从小到大排序
-            post_list.sort(key=lambda x: x['postage'])
+            quote_requests.append((country_code, post_code, weight))
+
+        # 计算所有订单各渠道运费(按运费从小到大排序)，分区渠道和价格参数使用运费缓存
+        zone_index = await get_zone_index()
+        rate_table = await get_rate_table()
+        zone_rates = await get_zone_rates(quote_requests, zone_index,
+                                          rate_table)
+        for od, (country_code, _, weight), rates in zip(
+                orders, quote_requests, zone_rates):
+            post_list = post_fields(
+                quote_options(rates, country_code, weight, rate_table))
             order_list.append({
-                'order_number': order_num,
+                'order_number': od.get('orderNumber', ''),
                 'post_list': post_list
             })
 
     return {"order_list": order_list}
-
-
-async def calc_post_price(area: str, weight: int, carrier_code: str):
-    """
-    计算订单运费
-    参数:
-        area: 区域
-        weight: 重量(克)
-        carrier_code: 物流渠道代码
-    返回: 运费计算结果
-    """
-
-    # 查询符合条件的物流价格
-    price = await PostPrice.filter(area=area,
-                                   carrier_code=carrier_code,
-                                   min_weight__lte=weight,
-                                   max_weight__gte=weight).first()
-
-    if not price:
-        return 0
-
-    # 计算运费: calc_price * weight / 1000 + basic_price
-    total_price = (price.calc_price * weight / 1000) + price.basic_price
-    return round(total_price, 2)
@@ -0,0 +1,81 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+# 马帮登录凭证文件(web、celery各进程共享)
+TOKEN_PATH = Path(__file__).parent.parent.parent / "mb_token.json"
+CHECK_INTERVAL = 1.0  # 两次检查文件修改时间的最小间隔(秒)
+
+_lock = threading.Lock()
+_token = None  # 缓存的凭证内容
+_signature = None  # 缓存对应的文件(修改时间, 大小)
+_checked_at = 0.0
+
+
+def _file_signature():
+    stat = os.stat(TOKEN_PATH)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def get_token():
+    """
+    获取马帮凭证(cookie和update_time)
+    凭证缓存在进程内，最多每秒检查一次文件修改时间，文件变化后才重新读取
+    """
+    global _token, _signature, _checked_at
+    now = time.monotonic()
+    if _token is not None and now - _checked_at < CHECK_INTERVAL:
+        return _token
+    with _lock:
+        signature = _file_signature()
+        if _token is None or signature != _signature:
+            with open(TOKEN_PATH, 'r') as f:
+                _token = json.load(f)
+            _signature = signature
+        _checked_at = now
+        return _token
+
+
+def get_cookie():
+    """获取马帮cookie"""
+    return get_token()["cookie"]
+
+
+def save_cookie(cookie):
+    """
+    更新马帮cookie
+    先写入同目录下的临时文件再替换原文件，其他进程不会读到写了一半的文件
+    返回: 更新后的凭证
+    """
+    global _token, _signature, _checked_at
+    with _lock:
+        token, mode = {}, 0o644
+        if TOKEN_PATH.exists():
+            with open(TOKEN_PATH, 'r') as f:
+                token = json.load(f)
+            mode = os.stat(TOKEN_PATH).st_mode & 0o777
+        token["cookie"] = cookie
+        token["update_time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        fd, tmp_path = tempfile.mkstemp(dir=TOKEN_PATH.parent,
+                                        prefix=".mb_token.",
+                                        suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(token, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, mode)  # 保持原文件权限
+            os.replace(tmp_path, TOKEN_PATH)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        _token = token
+        _signature = _file_signature()
+        _checked_at = time.monotonic()
+        return token
@@ -0,0 +1,144 @@
+import asyncio
+import collections
+import os
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from apps.mb.credentials import get_cookie
+from apps.mb.limiter import limiter, backoff_delay
+from config import config
+
+# 马帮ERP接口地址
+ORDER_API_URL = f"{config.MB_ERP_URL}/index.php?mod=order.oTc"
+ITEM_API_URL = f"{config.MB_ERP_URL}/index.php?mod=order.showOrderItems"
+ROWS_PER_PAGE = 500  # 每页订单数量
+
+# 进程内共享的keep-alive会话
+_session = None
+_session_pid = None
+
+
+def get_session():
+    """
+    获取共享的requests会话，复用连接池避免每页重新建立连接
+    celery prefork 子进程中按进程重新创建，不与父进程共享socket
+    """
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2,
+                              pool_maxsize=max(config.MB_FETCH_CONCURRENCY,
+                                               1))
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _session = session
+        _session_pid = os.getpid()
+    return _session
+
+
+def erp_post(url, headers, data):
+    """
+    发送ERP请求: 经过共享限流器，设置超时，
+    连接错误、超时、429和5xx响应按指数退避加抖动重试
+    返回: 最后一次的响应，重试用尽仍无响应时抛出异常
+    """
+    timeout = (config.MB_ERP_CONNECT_TIMEOUT, config.MB_ERP_READ_TIMEOUT)
+    attempt = 0
+    while True:
+        wait = limiter.acquire()
+        start = time.perf_counter()
+        response, error = None, None
+        try:
+            response = get_session().post(url,
+                                          headers=headers,
+                                          data=data,
+                                          timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        except BaseException:
+            limiter.release(time.perf_counter() - start, ok=False)
+            raise
+        latency = time.perf_counter() - start
+        if response is not None and response.status_code != 429 \
+                and response.status_code < 500:
+            limiter.release(latency, ok=True)
+            limiter.record(wait, latency, retry=attempt > 0)
+            return response
+        limiter.release(latency, ok=False)
+        limiter.record(wait, latency, error=True, retry=attempt > 0)
+        reason = error if response is None else response.status_code
+        if attempt >= config.MB_ERP_MAX_RETRIES:
+            print(f"ERP请求失败({reason})，已重试{attempt}次")
+            if response is None:
+                raise error  # type: ignore
+            return response
+        attempt += 1
+        print(f"ERP请求失败({reason})，第{attempt}次重试")
+        time.sleep(backoff_delay(attempt - 1))
+
+
+# 发送请求获取订单数据
+def send_order_requests(start_time, end_time, page):
+    headers = {
+        "cookie": get_cookie(),
+        "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8"
+    }
+    form_data = {
+        "queryTime": "paidTime",
+        "startTime1": start_time,
+        "endTime1": end_time,
+        "page": page,
+        "rowsPerPage": str(ROWS_PER_PAGE),
+        "a": "orderalllist",
+        "TextZx": "",
+        "TextZd": "",
+        "post_tableBase": "1"
+    }
+    response = erp_post(ORDER_API_URL, headers, form_data)
+    return response
+
+
+# 发送请求获取订单商品数据
+def send_item_requests(order_ids):
+    headers = {
+        "cookie": get_cookie(),
+        "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8"
+    }
+    form_data = {"orderItemIq": order_ids, "tableBase": 2, "isAllList": 1}
+    response = erp_post(ITEM_API_URL, headers, form_data)
+    return response
+
+
+async def _fetch_page(start_time, end_time, page):
+    start = time.perf_counter()
+    response = await asyncio.to_thread(send_order_requests, start_time,
+                                       end_time, page)
+    return page, response, round(time.perf_counter() - start, 3)
+
+
+async def iter_order_pages(start_time, end_time, pages, concurrency=None):
+    """
+    并发获取订单分页数据，按页码顺序逐页返回
+    同一时间最多 concurrency 个页面在请求或等待消费，内存占用与总页数无关
+    参数:
+        pages: 需要获取的页码列表
+        concurrency: 最大并发数，默认取配置 MB_FETCH_CONCURRENCY
+    返回: 异步迭代 (page, response, latency)，latency单位为秒
+    """
+    concurrency = max(concurrency or config.MB_FETCH_CONCURRENCY, 1)
+    pending = collections.deque()
+    try:
+        for page in pages:
+            pending.append(
+                asyncio.create_task(
+                    _fetch_page(start_time, end_time, page)))
+            if len(pending) >= concurrency:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        # 消费方提前退出或出错时取消未完成的请求
+        for task in pending:
+            task.cancel()
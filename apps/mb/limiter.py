@@ -0,0 +1,199 @@
+import random
+import threading
+import time
+
+import redis
+
+from config import config
+
+# Redis中的限流与监控数据
+BUCKET_KEY = "mb:erp:bucket"
+METRICS_KEY = "mb:erp:metrics:{minute}"
+METRICS_TTL = 2 * 60 * 60  # 监控数据保留时间(秒)
+
+# 令牌桶脚本: 使用Redis服务器时间计算令牌，所有worker共享同一个桶
+# 返回需要等待的秒数，0表示已取得令牌
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or burst
+local ts = tonumber(data[2]) or now
+tokens = math.min(burst, tokens + math.max(now - ts, 0) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 3600)
+return tostring(wait)
+"""
+
+
+class ErpLimiter:
+    """
+    马帮ERP请求限流器
+    - 令牌桶: 优先使用Redis实现跨worker共享，Redis不可用时退回进程内令牌桶
+    - 自适应并发: 成功时缓慢增加并发上限，出错或响应过慢时减半(AIMD)
+    - 监控: 按分钟记录请求数、错误数、重试数、等待时间和响应时间
+    """
+
+    def __init__(self):
+        self.max_concurrency = max(config.MB_FETCH_CONCURRENCY, 1)
+        self.limit = float(self.max_concurrency)  # 当前并发上限
+        self.active = 0  # 当前进行中的请求数
+        self._cond = threading.Condition()
+        self._redis = None
+        self._script = None
+        self._redis_failed_at = 0.0
+        # 进程内令牌桶(Redis不可用时使用)
+        self._tokens = float(config.MB_ERP_BURST)
+        self._tokens_ts = time.monotonic()
+        self._token_lock = threading.Lock()
+
+    def _get_redis(self):
+        # Redis出错后30秒内不再重试，避免每个请求都等待连接超时
+        if self._redis is None and time.monotonic(
+        ) - self._redis_failed_at > 30:
+            self._redis = redis.Redis(host=config.REDIS_HOST,
+                                      port=config.REDIS_PORT,
+                                      db=0,
+                                      socket_timeout=2,
+                                      socket_connect_timeout=2)
+            self._script = self._redis.register_script(TOKEN_BUCKET_SCRIPT)
+        return self._redis
+
+    def _redis_error(self, e):
+        print(f"ERP限流Redis不可用，使用进程内限流: {str(e)}")
+        self._redis = None
+        self._redis_failed_at = time.monotonic()
+
+    def _take_local_token(self):
+        with self._token_lock:
+            now = time.monotonic()
+            self._tokens = min(
+                config.MB_ERP_BURST,
+                self._tokens + (now - self._tokens_ts) * config.MB_ERP_RATE)
+            self._tokens_ts = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / config.MB_ERP_RATE
+
+    def _take_token(self):
+        """取得一个令牌，返回需要等待的秒数(0表示已取得)"""
+        client = self._get_redis()
+        if client is not None:
+            try:
+                return float(
+                    self._script(keys=[BUCKET_KEY],
+                                 args=[config.MB_ERP_RATE,
+                                       config.MB_ERP_BURST]))
+            except redis.RedisError as e:
+                self._redis_error(e)
+        return self._take_local_token()
+
+    def acquire(self):
+        """
+        等待并发名额和令牌
+        返回: 等待时间(秒)
+        """
+        start = time.perf_counter()
+        with self._cond:
+            while self.active >= int(self.limit):
+                self._cond.wait()
+            self.active += 1
+        try:
+            while True:
+                wait = self._take_token()
+                if wait <= 0:
+                    break
+                time.sleep(wait)
+        except BaseException:
+            self.release(0, ok=True)
+            raise
+        return time.perf_counter() - start
+
+    def release(self, latency, ok):
+        """
+        释放并发名额，并根据结果调整并发上限
+        """
+        with self._cond:
+            self.active -= 1
+            if not ok or latency > config.MB_ERP_TARGET_LATENCY:
+                self.limit = max(1.0, self.limit / 2)
+            else:
+                self.limit = min(float(self.max_concurrency),
+                                 self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def record(self, wait, latency, error=False, retry=False):
+        """记录一次请求的监控数据"""
+        client = self._get_redis()
+        if client is None:
+            return
+        key = METRICS_KEY.format(minute=int(time.time() // 60))
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.hincrby(key, "requests", 1)
+            pipe.hincrby(key, "errors", int(error))
+            pipe.hincrby(key, "retries", int(retry))
+            pipe.hincrbyfloat(key, "wait_seconds", wait)
+            pipe.hincrbyfloat(key, "latency_seconds", latency)
+            pipe.hset(key, "concurrency_limit", round(self.limit, 2))
+            pipe.expire(key, METRICS_TTL)
+            pipe.execute()
+        except redis.RedisError as e:
+            self._redis_error(e)
+
+
+limiter = ErpLimiter()
+
+
+def backoff_delay(attempt):
+    """指数退避 + 全抖动"""
+    return random.uniform(0, min(config.MB_ERP_RETRY_MAX_DELAY,
+                                 config.MB_ERP_RETRY_BASE_DELAY * 2**attempt))
+
+
+def get_metrics(minutes=5):
+    """
+    汇总最近几分钟的ERP请求监控数据
+    """
+    client = redis.Redis(host=config.REDIS_HOST, port=config.REDIS_PORT, db=0)
+    current = int(time.time() // 60)
+    pipe = client.pipeline(transaction=False)
+    for minute in range(current - minutes + 1, current + 1):
+        pipe.hgetall(METRICS_KEY.format(minute=minute))
+    totals = {
+        "requests": 0,
+        "errors": 0,
+        "retries": 0,
+        "wait_seconds": 0.0,
+        "latency_seconds": 0.0
+    }
+    concurrency_limit = None
+    for data in pipe.execute():
+        for key in totals:
+            value = data.get(key.encode())
+            if value is not None:
+                totals[key] += type(totals[key])(float(value))
+        if data.get(b"concurrency_limit") is not None:
+            concurrency_limit = float(data[b"concurrency_limit"])
+    requests = totals["requests"]
+    return {
+        "minutes": minutes,
+        "requests": requests,
+        "request_rate": round(requests / (minutes * 60), 3),  # 每秒请求数
+        "error_rate": round(totals["errors"] / requests, 4) if requests else 0,
+        "retries": totals["retries"],
+        "avg_wait": round(totals["wait_seconds"] / requests, 3)
+        if requests else 0,  # 平均等待时间(秒)
+        "avg_latency": round(totals["latency_seconds"] / requests, 3)
+        if requests else 0,  # 平均响应时间(秒)
+        "concurrency_limit": concurrency_limit  # 最近一次的并发上限
+    }
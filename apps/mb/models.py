@@ -8,13 +8,17 @@ class Orders(Model):
     # 基础信息
     order_number = fields.CharField(max_length=30,
                                     null=True,
+                                    index=True,
                                     description="订单编号")
     is_refund = fields.BooleanField(default=False,
                                     null=True,
                                     description="是否已退款")
     is_change_confirm = fields.BooleanField(default=False,
                                             description="变更是否确认")
-    order_id = fields.CharField(max_length=30, null=True, description="订单ID")
+    order_id = fields.CharField(max_length=30,
+                                null=True,
+                                index=True,
+                                description="订单ID")
     platform_number = fields.CharField(max_length=30,
                                        null=True,
                                        description="交易编号")
@@ -26,7 +30,9 @@ class Orders(Model):
                                   description="订单备注")
 
     # 时间信息
-    paid_time = fields.DatetimeField(null=True, description="付款时间")
+    paid_time = fields.DatetimeField(null=True,
+                                     index=True,
+                                     description="付款时间")
     order_sent_time = fields.DatetimeField(null=True, description="发货时间")
     create_time = fields.DatetimeField(null=True, description="创建时间")
 
@@ -107,12 +113,17 @@ class Orders(Model):
                                      null=True,
                                      description="平台备注")
 
+    payload_hash = fields.CharField(max_length=32,
+                                    null=True,
+                                    description="ERP订单数据哈希")
+
     def __str__(self):
         return self.order_number
 
     class Meta:
         table = "orders"
         table_description = "订单表"
+        indexes = (("store_name", "paid_time"), )
 
 
 # 马帮订单商品表
@@ -144,3 +155,28 @@ class OrderItems(Model):
     class Meta:
         table = "items"
         table_description = "订单商品表"
+
+
+# 订单同步状态表
+class SyncState(Model):
+    id = fields.IntField(pk=True)
+    name = fields.CharField(max_length=100,
+                            unique=True,
+                            description="同步任务名称")
+    last_paid_time = fields.DatetimeField(null=True,
+                                          description="已同步的最大付款时间")
+    last_run_time = fields.DatetimeField(null=True,
+                                         description="最近一次成功运行时间")
+    status = fields.CharField(max_length=20,
+                              null=True,
+                              description="最近一次运行状态")
+    message = fields.CharField(max_length=200,
+                               null=True,
+                               description="最近一次运行结果")
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        table = "sync_state"
+        table_description = "订单同步状态表"
@@ -0,0 +1,117 @@
+import re
+
+import lxml.html
+from lxml import etree
+
+# 预编译的XPath表达式
+_TR_XPATH = etree.XPath("//tr")
+_SKU_XPATH = etree.XPath(".//a[@data-copy-id='copySkuNumber']")
+_IMG_SRC_XPATH = etree.XPath("(.//img)[1]/@src")
+_QTY_XPATH = etree.XPath(
+    ".//span[contains(concat(' ', normalize-space(@class), ' '),"
+    " ' stock-product-nums ')]")
+# 与 BeautifulSoup 的 find_next('a') 一致: 文档顺序中的下一个<a>
+_NEXT_A_XPATH = etree.XPath("(descendant::a | following::a)[1]")
+_NAME_XPATH = etree.XPath(".//span[@data-field='productName']/@title")
+_SPECIFICS_XPATH = etree.XPath(
+    ".//p[@data-field='specifics']/@data-original-title")
+_PRICE_XPATH = etree.XPath(".//td[@data-field='sellPrice']")
+_P_XPATH = etree.XPath("//p")
+
+# 第一个<p>内只有纯文本时直接用正则读取，避免构建DOM
+_FIRST_P_RE = re.compile(r'<p(?:\s[^>]*)?>([^<]*)(</p>)?', re.I)
+
+CARRIER_UNSELECTED = '物流渠道未选择'
+
+
+def _parse_document(text):
+    if not text or not text.strip():
+        return None
+    return lxml.html.document_fromstring(text)
+
+
+def first_p_text(text):
+    """
+    获取html中第一个<p>的文本，不存在时返回None
+    """
+    if not text:
+        return None
+    match = _FIRST_P_RE.search(text)
+    if not match:
+        return None
+    if match.group(2) and '&' not in match.group(1):
+        return match.group(1)
+    doc = _parse_document(text)
+    p_tags = _P_XPATH(doc) if doc is not None else []
+    if not p_tags:
+        return None
+    return p_tags[0].text_content()
+
+
+def parse_carrier(cansend1logisticsHtml):
+    """
+    解析物流渠道html
+    返回: (物流渠道, 物流公司)
+    """
+    text = first_p_text(cansend1logisticsHtml)
+    if text is None or text == CARRIER_UNSELECTED:
+        return '', ''
+    parts = text.split('[')
+    return parts[0], parts[1].replace(']', '')
+
+
+def parse_items(items_html):
+    """
+    解析订单商品html，每个<tr>对应一个商品
+    返回: 商品字典列表(sku/image_url/item_qty/item_id/item_url/
+          item_name/platform_property/item_cost)
+    """
+    doc = _parse_document(items_html)
+    if doc is None:
+        return []
+    records = []
+    for tr in _TR_XPATH(doc):
+        # 获取 SKU 编号
+        sku_tag = _SKU_XPATH(tr)[0]
+        # 获取图片
+        img_src = _IMG_SRC_XPATH(tr)
+        # 获取数量
+        qty_tag = _QTY_XPATH(tr)[0]
+        # 获取item id 和 url
+        item_id_tag = _NEXT_A_XPATH(sku_tag)
+        item_id_tag = item_id_tag[0] if item_id_tag else None
+        # 获取商品成本价格
+        price = None
+        price_td = _PRICE_XPATH(tr)
+        if price_td:
+            price_p = price_td[0].find('.//p')
+            if price_p is not None:
+                price = price_p.text_content().strip()
+
+        records.append({
+            'sku': sku_tag.text_content(),
+            'image_url': str(img_src[0]) if img_src else None,
+            'item_qty': int(qty_tag.text_content()),
+            'item_id': item_id_tag.text_content()
+            if item_id_tag is not None else '',
+            'item_url': item_id_tag.get('href')
+            if item_id_tag is not None else '',
+            'item_name': str(_NAME_XPATH(tr)[0]),
+            'platform_property': str(_SPECIFICS_XPATH(tr)[0]).replace(
+                "<br/>", ","),
+            'item_cost': float(price) if price is not None else None,
+        })
+    return records
+
+
+def parse_items_batch(all_items):
+    """
+    批量解析订单商品html(只返回普通字典)
+    参数:
+        all_items: {订单ID: 商品html}
+    返回: {订单ID: 商品记录列表}
+    """
+    return {
+        order_id: parse_items(items_html)
+        for order_id, items_html in all_items.items()
+    }
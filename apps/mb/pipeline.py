@@ -0,0 +1,108 @@
+import asyncio
+
+from apps.common.stages import run_stages
+from apps.mb.erp import iter_order_pages, send_item_requests
+from apps.mb.parsers import parse_items_batch
+from apps.mb.sync import upsert_orders, upsert_items, parse_paid_time
+from config import config
+
+
+async def run_sync_pipeline(start_time, end_time, first_orders, total_page):
+    """
+    流式同步订单: 获取分页 -> 写入订单 -> 获取商品 -> 解析商品 -> 写入商品
+    各阶段之间使用有界队列连接，每次只处理一页订单，
+    内存峰值取决于分页大小而非时间范围长度
+    参数:
+        first_orders: 第一页订单数据(已用于校验登录状态)
+        total_page: 总页数
+    返回: 统计信息，有分页或商品获取失败时 max_paid_time 为None(数据不完整)
+    """
+    stats = {
+        'orders': 0,
+        'created': 0,
+        'updated': 0,
+        'max_paid_time': None,  # 本次同步到的最大付款时间
+        'failed_pages': [],  # 获取失败的页码
+        'failed_item_orders': 0,  # 商品获取失败的订单数
+        'page_latency': {}
+    }
+    queue_size = max(config.MB_PIPELINE_QUEUE_SIZE, 1)
+    page_queue = asyncio.Queue(maxsize=queue_size)  # 每页订单数据
+    id_queue = asyncio.Queue(maxsize=queue_size)  # 每页订单ID
+    item_queue = asyncio.Queue(maxsize=queue_size)  # 每页商品html
+    record_queue = asyncio.Queue(maxsize=queue_size)  # 每页解析后的商品记录
+
+    async def fetch_pages():
+        await page_queue.put(first_orders)
+        async for page, response, latency in iter_order_pages(
+                start_time, end_time, range(2, total_page + 1)):
+            stats['page_latency'][page] = latency
+            if response.status_code == 200:
+                page_data = response.json()
+                await page_queue.put(page_data.get('orderDataList', []))
+            else:
+                print(f"获取第{page}页订单失败: {response.status_code}")
+                stats['failed_pages'].append(page)
+        await page_queue.put(None)
+
+    async def write_orders():
+        while True:
+            page_orders = await page_queue.get()
+            if page_orders is None:
+                break
+            create_num, update_num, item_order_ids = await upsert_orders(
+                page_orders)
+            stats['orders'] += len(page_orders)
+            stats['created'] += create_num
+            stats['updated'] += update_num
+            for order in page_orders:
+                paid_time = parse_paid_time(order)
+                if paid_time and (stats['max_paid_time'] is None
+                                  or paid_time > stats['max_paid_time']):
+                    stats['max_paid_time'] = paid_time
+            # 只有新增、变更或商品未同步的订单需要获取商品
+            await id_queue.put(item_order_ids)
+        await id_queue.put(None)
+
+    async def fetch_items():
+        while True:
+            id_list = await id_queue.get()
+            if id_list is None:
+                break
+            if not id_list:
+                continue
+            response = await asyncio.to_thread(send_item_requests,
+                                               ','.join(id_list))
+            if response.status_code == 200:
+                order_items = response.json()
+                await item_queue.put(
+                    order_items.get('order_list_html_header', {}))
+            else:
+                print(f"获取 {len(id_list)} 个订单的商品失败: "
+                      f"{response.status_code}")
+                stats['failed_item_orders'] += len(id_list)
+        await item_queue.put(None)
+
+    async def parse_items():
+        while True:
+            items = await item_queue.get()
+            if items is None:
+                break
+            # 在工作线程中解析(lxml解析时释放GIL)，不阻塞事件循环，解析与写入订单/商品并行
+            records = await asyncio.to_thread(parse_items_batch, items)
+            await record_queue.put(records)
+        await record_queue.put(None)
+
+    async def write_items():
+        while True:
+            records = await record_queue.get()
+            if records is None:
+                break
+            await upsert_items(records)
+
+    await run_stages(fetch_pages(), write_orders(), fetch_items(),
+                     parse_items(), write_items())
+    if stats['failed_pages'] or stats['failed_item_orders']:
+        # 缺失的订单付款时间可能早于已获取的最大值，不能作为同步水位
+        stats['max_paid_time'] = None
+    return stats
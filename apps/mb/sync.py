@@ -0,0 +1,406 @@
+import hashlib
+import json
+from datetime import datetime
+from functools import lru_cache
+
+from tortoise.transactions import in_transaction
+
+from apps.mb.models import Orders, OrderItems
+from apps.mb.parsers import parse_carrier
+
+WRITE_CHUNK_SIZE = 500  # 每个事务写入的订单数量
+TIME_CACHE_SIZE = 8192  # 时间解析缓存数量
+TIMEZONE_SUFFIX = '(UTC+8)'
+
+# 参与数据哈希计算的ERP订单字段(即同步时会读取的字段)
+HASH_FIELDS = (
+    'id', 'isRefund', 'platformOrderId', 'salesRecordNumber',
+    'platform_order_status', 'orderRemarkText', 'paidTime', 'paidTimeTimezone',
+    'expressTime', 'expressTimezone', 'createDate', 'createDateTimezone',
+    'cansend1logisticsHtml', 'shippingService', 'trackNumber', 'countryCode',
+    'shopIdText', 'platformIdText', 'orderWeight', 'showOrderStatusText',
+    'buyerUserId', 'buyerName', 'countryCodeEn', 'province', 'city',
+    'postCode', 'street1', 'street2', 'email', 'shippingFee_original',
+    'shippingFee', 'shippingCost', 'accountOrderFee_original',
+    'accountOrderFee', 'currencyId', 'profit', 'profit_original',
+    'profit_rate', 'buyerMessageText')
+
+
+# 通用时间解析函数，处理各种时间格式和时区信息
+def robust_time_parse(time_str, default=None):
+    """
+    健壮的时间解析函数，能处理多种时间格式和时区信息
+    支持格式：
+    - YYYY-MM-DD HH:MM:SS
+    - YYYY-MM-DD HH:MM
+    - YYYY-MM-DD
+    - 带有时区信息的格式如：YYYY-MM-DD HH:MM:SS(UTC+8)
+    """
+    if not time_str or time_str == '--':
+        return default
+
+    # 移除时区信息
+    if '(UTC+8)' in time_str:
+        time_str = time_str.replace(' (UTC+8)', '').replace('(UTC+8)', '')
+
+    # 尝试不同的时间格式
+    formats_to_try = [
+        "%Y-%m-%d %H:%M:%S",
+        "%Y-%m-%d %H:%M",
+        "%Y-%m-%d"
+    ]
+
+    for fmt in formats_to_try:
+        try:
+            return datetime.strptime(time_str, fmt)
+        except ValueError:
+            continue
+
+    # 如果都失败但格式看起来像 "HH:MM" 类型，尝试添加秒数
+    if len(time_str.split(':')) == 2:
+        try:
+            return datetime.strptime(time_str + ':00', "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            pass
+
+    # 最终尝试 - 对于只有日期和小时:分钟的格式
+    if ' ' in time_str and len(time_str.split(' ')[1].split(':')) == 2:
+        try:
+            return datetime.strptime(time_str + ':00', "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            pass
+
+    # 如果所有尝试都失败，返回默认值
+    if default is not None:
+        return default
+    raise ValueError(f"无法解析时间字符串: {time_str}")
+
+
+@lru_cache(maxsize=TIME_CACHE_SIZE)
+def _cached_time_parse(time_str):
+    """
+    解析时间并缓存结果(datetime不可变，可以共享)，无法解析时返回None
+    """
+    value = time_str
+    if value.endswith(TIMEZONE_SUFFIX):
+        value = value[:-len(TIMEZONE_SUFFIX)]
+        if value.endswith(' '):
+            value = value[:-1]
+    # 常见格式 YYYY-MM-DD HH:MM:SS 按位置校验后直接构造
+    if (len(value) == 19 and value.isascii() and value[4] == '-'
+            and value[7] == '-' and value[10] == ' ' and value[13] == ':'
+            and value[16] == ':'
+            and (value[0:4] + value[5:7] + value[8:10] + value[11:13] +
+                 value[14:16] + value[17:19]).isdigit()):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    try:
+        return robust_time_parse(time_str)
+    except ValueError:
+        return None
+
+
+def fast_time_parse(time_str, default=None):
+    """
+    快速时间解析，结果与 robust_time_parse 一致
+    常见格式直接按位置解析，其他格式交给 robust_time_parse，
+    解析结果按原字符串缓存(同一批订单的时间大量重复)
+    """
+    if not time_str or time_str == '--':
+        return default
+    result = _cached_time_parse(time_str)
+    if result is None:
+        # 无法解析时按原函数处理(返回默认值或抛出异常)
+        return robust_time_parse(time_str, default)
+    return result
+
+
+def parse_paid_time(order):
+    """解析付款时间，优先使用带时区的字段"""
+    if 'paidTimeTimezone' in order and order['paidTimeTimezone'] and order['paidTimeTimezone'] != '--':
+        return fast_time_parse(order['paidTimeTimezone'])
+    return fast_time_parse(order['paidTime'])
+
+
+def parse_sent_time(order):
+    """解析发货时间，优先使用带时区的字段"""
+    if order['expressTime'] == '--':
+        return None
+    if 'expressTimezone' in order and order['expressTimezone'] and order['expressTimezone'] != '--':
+        return fast_time_parse(order['expressTimezone'])
+    return fast_time_parse(order['expressTime'])
+
+
+def build_order(order, carrier_name, carrier_company):
+    """
+    根据ERP订单数据创建新的订单对象(未保存)
+    """
+    orders = Orders()
+    # 订单基础信息
+    orders.order_id = order['id']  # 订单ID（系统内部）
+    orders.is_refund = True if order['isRefund'] == 1 else False  # 是否退款
+    orders.order_number = order['platformOrderId']  # 平台订单号
+    orders.platform_number = order['salesRecordNumber']  # 销售记录号
+    orders.platform_status = order['platform_order_status']  # 平台订单状态
+    if '_' in order['platformOrderId']:
+        orders.is_resent = True  # 是否重发订单
+
+    # 订单备注信息
+    orders.order_note = order['orderRemarkText']  # 订单备注
+
+    # 处理付款时间
+    orders.paid_time = parse_paid_time(order)
+
+    # 处理发货时间
+    orders.order_sent_time = parse_sent_time(order)  # type: ignore
+
+    # 处理创建时间
+    if 'createDateTimezone' in order and order['createDateTimezone'] and order['createDateTimezone'] != '--':
+        orders.create_time = fast_time_parse(order['createDateTimezone'])
+    else:
+        orders.create_time = fast_time_parse(order['createDate'])
+
+    orders.carrier_company = carrier_company  # 物流公司名称
+    orders.carrier_name = carrier_name  # 承运商名称
+    orders.selected_carrier = order['shippingService']  # 选择的物流服务
+    orders.tracking_number = order['trackNumber']  # 物流跟踪号
+
+    # 店铺和平台信息
+    orders.country_code = order['countryCode']  # 国家代码
+    orders.store_name = order['shopIdText']  # 店铺名称
+    orders.platform = order['platformIdText']  # 平台名称
+
+    # 订单状态和重量
+    orders.order_weight = order['orderWeight']  # 订单重量
+    orders.order_status = order['showOrderStatusText']  # 订单状态显示文本
+
+    # 买家信息
+    orders.buyer_id = order['buyerUserId']  # 买家ID
+    orders.buyer_name = order['buyerName']  # 买家姓名
+    orders.country = order['countryCodeEn']  # 国家(英文)
+    orders.state = order['province']  # 省/州
+    orders.city = order['city']  # 城市
+    orders.post_code = order['postCode']  # 邮编
+    orders.address = order['street1'] + order['street2']  # 地址(街道1+街道2)
+    orders.email = order['email']  # 买家邮箱
+
+    # 价格信息
+    orders.postage_in_f = float(order['shippingFee_original'].replace(
+        ',', '')) if order['shippingFee_original'] else 0.0  # 原始运费(外币)
+    orders.postage_in_rmb = float(order['shippingFee'].replace(
+        ',', '')) if order['shippingFee'] else 0.0  # 运费(人民币)
+    orders.postage_out_rmb = float(order['shippingCost'].replace(
+        'RMB', '').replace(
+            ',', '')) if order['shippingCost'] else 0.0  # 实际运费成本(去除RMB字符)
+    orders.order_price_f = float(
+        order['accountOrderFee_original'].replace(',', '')
+    ) if order['accountOrderFee_original'] else 0.0  # 订单总价(外币)
+    orders.order_price_rmb = float(order['accountOrderFee'].replace(
+        ',', '')) if order['accountOrderFee'] else 0.0  # 订单总价(人民币)
+    orders.currency = order['currencyId']  # 货币类型
+    orders.profit_rmb = float(order['profit'].replace(
+        ',', '')) if order['profit'] else 0.0  # 利润(人民币)
+    orders.profit_f = float(order['profit_original'].replace(
+        ',', '')) if order['profit_original'] else 0.0  # 利润(外币)
+
+    orders.margin = order['profit_rate']  # 利润率
+
+    # 平台备注
+    orders.platform_note = order['buyerMessageText'][:500] if order[
+        'buyerMessageText'] else None  # 买家留言/平台备注(截取前500字符)
+    return orders
+
+
+def apply_order_changes(od, order, carrier_name, carrier_company):
+    """
+    将ERP订单数据的变化合并到已有订单对象
+    返回: 发生变化的字段集合(为空表示无需更新)
+    """
+    changed = set()
+    # 订单更新了发货状态 --> 更新所有可能变化的字段
+    if od.order_status != order['showOrderStatusText'] and order[
+            'showOrderStatusText'] == '已发货':
+        od.order_status = order['showOrderStatusText']
+        od.order_sent_time = parse_sent_time(order)  # type: ignore
+        od.carrier_company = carrier_company  # 物流公司名称
+        od.carrier_name = carrier_name  # 承运商名称
+        od.tracking_number = order['trackNumber']  # 物流跟踪号
+        od.buyer_name = order['buyerName']  # 买家姓名
+        od.country = order['countryCodeEn']  # 国家(英文)
+        od.state = order['province']  # 省/州
+        od.city = order['city']  # 城市
+        od.post_code = order['postCode']  # 邮编
+        od.address = order['street1'] + order['street2']  # 地址(街道1+街道2)
+        od.email = order['email']  # 买家邮箱
+        od.order_note = order['orderRemarkText']  # 订单备注
+        od.is_change_confirm = True  # 变更是否确认
+        changed.update(('order_status', 'order_sent_time', 'carrier_company',
+                        'carrier_name', 'tracking_number', 'buyer_name',
+                        'country', 'state', 'city', 'post_code', 'address',
+                        'email', 'order_note', 'is_change_confirm'))
+    # 仅订单状态变化
+    if od.order_status != order['showOrderStatusText']:
+        od.order_status = order['showOrderStatusText']
+        od.is_refund = True if order['isRefund'] == 1 else False  # 是否退款
+        changed.update(('order_status', 'is_refund'))
+    # 仅物流信息变化
+    if od.carrier_name != carrier_name or od.tracking_number != order[
+            'trackNumber']:
+        od.carrier_name = carrier_name  # 承运商名称
+        od.carrier_company = carrier_company  # 物流公司名称
+        od.tracking_number = order['trackNumber']  # 物流跟踪号
+        changed.update(('carrier_name', 'carrier_company', 'tracking_number'))
+    return changed
+
+
+def order_payload_hash(order):
+    """
+    计算ERP订单数据中参与同步的字段哈希，用于跳过未变化的订单
+    """
+    values = [order.get(key) for key in HASH_FIELDS]
+    payload = json.dumps(values, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.blake2b(payload.encode('utf-8'),
+                           digest_size=16).hexdigest()
+
+
+def needs_items(od):
+    """订单商品是否需要(重新)同步"""
+    return not od.sku_total_qty or od.is_change_confirm
+
+
+async def upsert_orders(all_orders, chunk_size=WRITE_CHUNK_SIZE):
+    """
+    批量同步订单数据
+    先一次查询取出已有订单的数据哈希，哈希一致的订单跳过解析、比较和写入；
+    其余订单一次IN查询预加载后拆分为新增/更新两组，分块批量写入，
+    每个发生变化的订单只写一次
+    返回: (新增数量, 更新数量, 需要同步商品的订单ID列表)
+    """
+    order_numbers = list({order['platformOrderId'] for order in all_orders})
+    known = {}  # 订单编号 -> (哈希, SKU总数量, 变更是否确认)
+    if order_numbers:
+        rows = await Orders.filter(order_number__in=order_numbers).order_by(
+            'id').values_list('order_number', 'payload_hash',
+                              'sku_total_qty', 'is_change_confirm')
+        for order_number, *state in rows:
+            known.setdefault(order_number, tuple(state))
+
+    hashes = [order_payload_hash(order) for order in all_orders]
+    changed_numbers = list({
+        order['platformOrderId']
+        for order, payload_hash in zip(all_orders, hashes)
+        if order['platformOrderId'] in known
+        and known[order['platformOrderId']][0] != payload_hash
+    })
+    existing = {}
+    if changed_numbers:
+        for od in await Orders.filter(
+                order_number__in=changed_numbers).order_by('id'):
+            existing.setdefault(od.order_number, od)
+
+    to_create = {}  # 订单编号 -> 新订单
+    to_update = {}  # 订单编号 -> (订单, 变化字段)
+    updated_numbers = set()  # 字段发生变化的订单编号
+    item_order_ids = {}  # 需要同步商品的订单ID(保持顺序)
+    for order, payload_hash in zip(all_orders, hashes):
+        order_number = order['platformOrderId']
+        od = existing.get(order_number)
+        if od is None and order_number in known:
+            # 数据未变化，只判断商品是否需要补同步
+            _, sku_total_qty, is_change_confirm = known[order_number]
+            if not sku_total_qty or is_change_confirm:
+                item_order_ids[order['id']] = None
+            continue
+        carrier_name, carrier_company = parse_carrier(
+            order['cansend1logisticsHtml'])
+        if od is None:
+            od = build_order(order, carrier_name, carrier_company)
+            od.payload_hash = payload_hash
+            existing[order_number] = od
+            to_create[order_number] = od
+        else:
+            changed = apply_order_changes(od, order, carrier_name,
+                                          carrier_company)
+            od.payload_hash = payload_hash
+            if order_number not in to_create:
+                _, fields = to_update.get(order_number, (od, set()))
+                to_update[order_number] = (od,
+                                           fields | changed | {'payload_hash'})
+                if changed:
+                    updated_numbers.add(order_number)
+        if needs_items(od):
+            item_order_ids[od.order_id] = None
+
+    # 按变化字段分组，同一组使用一条 bulk_update 语句
+    update_groups = {}
+    for od, fields in to_update.values():
+        update_groups.setdefault(frozenset(fields), []).append(od)
+
+    create_list = list(to_create.values())
+    for i in range(0, len(create_list), chunk_size):
+        async with in_transaction() as conn:
+            await Orders.bulk_create(create_list[i:i + chunk_size],
+                                     using_db=conn)
+    for fields, objs in update_groups.items():
+        for i in range(0, len(objs), chunk_size):
+            async with in_transaction() as conn:
+                await Orders.bulk_update(objs[i:i + chunk_size],
+                                         fields=sorted(fields),
+                                         using_db=conn)
+
+    return len(create_list), len(updated_numbers), list(item_order_ids)
+
+
+async def upsert_items(all_items, chunk_size=WRITE_CHUNK_SIZE):
+    """
+    批量同步订单商品数据
+    参数:
+        all_items: {订单ID: 商品记录列表}，由 parse_items 解析得到
+    一次IN查询预加载订单，已确认变更的订单先删除旧商品；
+    每个分块一个事务: 删除旧商品 + 一次bulk_create商品 + 一次bulk_update订单
+    返回: 写入商品的订单数量
+    """
+    order_ids = list(all_items.keys())
+    if not order_ids:
+        return 0
+    orders = {}
+    for od in await Orders.filter(order_id__in=order_ids).order_by('id'):
+        orders.setdefault(od.order_id, od)
+
+    pending = []  # (订单, 是否需要删除旧商品)
+    for order_id in order_ids:
+        od = orders.get(order_id)
+        if not od:
+            continue
+        if od.is_change_confirm:
+            # 订单更新了发货状态 --> 删除所有商品数据，不管有没有变化，都重新
+            od.sku_total_qty = 0
+            od.is_change_confirm = False
+            pending.append((od, True))
+        elif not od.sku_total_qty:
+            pending.append((od, False))
+        # 其余订单商品项已经更新过了，跳过
+
+    for i in range(0, len(pending), chunk_size):
+        chunk = pending[i:i + chunk_size]
+        to_create = []
+        for od, _ in chunk:
+            records = all_items[od.order_id]
+            to_create.extend(
+                OrderItems(order_id=od.pk, **record) for record in records)
+            # 更新订单商品总数量
+            od.sku_total_qty = len(records)
+        reset_pks = [od.pk for od, reset in chunk if reset]
+        async with in_transaction() as conn:
+            if reset_pks:
+                await OrderItems.filter(order_id__in=reset_pks).using_db(
+                    conn).delete()
+            if to_create:
+                await OrderItems.bulk_create(to_create, using_db=conn)
+            await Orders.bulk_update([od for od, _ in chunk],
+                                     fields=['sku_total_qty',
+                                             'is_change_confirm'],
+                                     using_db=conn)
+    return len(pending)
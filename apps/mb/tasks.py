@@ -1,85 +1,41 @@
-from celery_app import celery_app
+from celery import chord, group
+from celery_app import celery_app, run_async
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-import requests
+import asyncio
+import time
 import math
-from bs4 import BeautifulSoup
 
-from apps.mb.models import Orders, OrderItems
-import json
-from pathlib import Path
-from database import TORTOISE_ORM
-from tortoise import Tortoise
+from apps.mb.models import Orders, SyncState
+from apps.mb.erp import ROWS_PER_PAGE, send_order_requests
+from apps.mb.parsers import first_p_text
+from apps.mb.pipeline import run_sync_pipeline
 from decimal import Decimal
 from tortoise import connections
 from tortoise.functions import Count
-import asyncio
+from redis.exceptions import LockError
 from config import config
 
-# 通用时间解析函数，处理各种时间格式和时区信息
-def robust_time_parse(time_str, default=None):
-    """
-    健壮的时间解析函数，能处理多种时间格式和时区信息
-    支持格式：
-    - YYYY-MM-DD HH:MM:SS
-    - YYYY-MM-DD HH:MM
-    - YYYY-MM-DD
-    - 带有时区信息的格式如：YYYY-MM-DD HH:MM:SS(UTC+8)
-    """
-    if not time_str or time_str == '--':
-        return default
-    
-    # 移除时区信息
-    if '(UTC+8)' in time_str:
-        time_str = time_str.replace(' (UTC+8)', '').replace('(UTC+8)', '')
-    
-    # 尝试不同的时间格式
-    formats_to_try = [
-        "%Y-%m-%d %H:%M:%S",
-        "%Y-%m-%d %H:%M",
-        "%Y-%m-%d"
-    ]
-    
-    for fmt in formats_to_try:
-        try:
-            return datetime.strptime(time_str, fmt)
-        except ValueError:
-            continue
-    
-    # 如果都失败但格式看起来像 "HH:MM" 类型，尝试添加秒数
-    if len(time_str.split(':')) == 2:
-        try:
-            return datetime.strptime(time_str + ':00', "%Y-%m-%d %H:%M:%S")
-        except ValueError:
-            pass
-    
-    # 最终尝试 - 对于只有日期和小时:分钟的格式
-    if ' ' in time_str and len(time_str.split(' ')[1].split(':')) == 2:
-        try:
-            return datetime.strptime(time_str + ':00', "%Y-%m-%d %H:%M:%S")
-        except ValueError:
-            pass
-    
-    # 如果所有尝试都失败，返回默认值
-    if default is not None:
-        return default
-    raise ValueError(f"无法解析时间字符串: {time_str}")
-
-
-# 添加配置加载函数
-def load_config():
-    config_path = Path(__file__).parent.parent.parent / "mb_token.json"
-    with open(config_path, 'r') as f:
-        return json.load(f)
+# 同步状态名称
+INCREMENTAL_SYNC_NAME = "orders:incremental"  # 增量同步
+SWEEP_SYNC_NAME = "orders:sweep"  # 最近一周全量巡检
+# 同步任务锁: 按付款时间的小时分段(与最小的时间窗口一致)，付款时间范围有重叠的同步任务不会同时运行，
+# 按小时拆分的窗口互不等待；按天或更大范围同步时获取覆盖的所有小时锁
+SYNC_LOCK_NAME = "mb:sync_orders:lock:{hour}"
+SYNC_LOCK_TIMEOUT = 10 * 60  # 锁过期时间(秒)，同步期间定期续期
+SYNC_LOCK_RENEW_INTERVAL = 60  # 续期间隔(秒)
+SYNC_LOCK_WAIT = 60 * 60  # 等待锁的最长时间(秒)
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 
 # 自定义时间获取mb订单任务
 @celery_app.task
 def get_orders_task(start_time, end_time):
-    result = asyncio.run(get_mb_orders(start_time, end_time))
+    result = run_async(sync_orders_locked(start_time, end_time, wait=True))
     return result
 
 
-# 获取mb最近一周订单任务
+# 获取mb最近一周订单任务(全量巡检，用于补齐订单状态变化)
 @celery_app.task
 def get_oneweek_orders():
     end_date = (datetime.now()).strftime("%Y-%m-%d")
@@ -88,331 +44,295 @@ def get_oneweek_orders():
     start_time = datetime.strptime(start_date + " 00:00:00",
                                    "%Y-%m-%d %H:%M:%S")
     end_time = datetime.strptime(end_date + " 23:59:59", "%Y-%m-%d %H:%M:%S")
-    result = asyncio.run(get_mb_orders(start_time, end_time))
+    result = run_async(
+        sync_with_checkpoint(SWEEP_SYNC_NAME, start_time, end_time,
+                             wait=True))
+    return result
+
+
+# 按时间窗口拆分获取mb订单任务(大范围补数)
+@celery_app.task
+def get_orders_range_task(start_time, end_time, split_by="day", force=False):
+    """
+    将时间范围拆分为按天/按小时的窗口，以 chord 分发到所有worker并行同步，
+    已成功的窗口在重跑时跳过(force=True 时全部重跑)，最后汇总新增/更新数量
+    """
+    windows = split_windows(start_time, end_time, split_by)
+    finished = set() if force else run_async(
+        get_finished_windows([window_name(s, e) for s, e in windows]))
+    todo = [(s, e) for s, e in windows if window_name(s, e) not in finished]
+    if not todo:
+        return {
+            "status": "success",
+            "message": f"{len(windows)} 个时间窗口均已同步，无需重跑"
+        }
+    header = group(get_window_orders_task.s(s, e) for s, e in todo)
+    result = chord(header)(merge_sync_results.s(len(windows) - len(todo)))
+    return {
+        "status": "started",
+        "message": f"共 {len(windows)} 个时间窗口，跳过已完成 {len(finished)} 个",
+        "task_id": result.id  # 汇总任务ID
+    }
+
+
+# 同步单个时间窗口的订单
+@celery_app.task
+def get_window_orders_task(start_time, end_time):
+    # 等待付款时间重叠的其他同步任务(如定时巡检)完成，避免窗口被跳过
+    result = run_async(
+        sync_with_checkpoint(window_name(start_time, end_time),
+                             start_time,
+                             end_time,
+                             wait=True))
     return result
 
 
-async def get_mb_orders(start_time, end_time):
+# 汇总各时间窗口的同步结果
+@celery_app.task
+def merge_sync_results(results, skipped=0):
+    created = sum(r.get("created", 0) for r in results)
+    updated = sum(r.get("updated", 0) for r in results)
+    failed = [
+        r.get("window") for r in results if r.get("status") != "success"
+    ]
+    return {
+        "status": "success" if not failed else "error",
+        "message":
+        f"同步 {len(results)} 个时间窗口(跳过 {skipped} 个)，新增 {created} 个，更新 {updated} 个，失败 {len(failed)} 个",
+        "created": created,
+        "updated": updated,
+        "failed_windows": failed  # 失败的窗口，重跑时会再次同步
+    }
+
+
+def to_datetime(value):
+    """时间字符串转为datetime，已是datetime时直接返回"""
+    return value if isinstance(value, datetime) else datetime.strptime(
+        value, TIME_FORMAT)
+
+
+def split_windows(start_time, end_time, split_by="day"):
     """
-    获取mb订单数据
+    按天或按小时拆分时间范围，返回 [(开始时间, 结束时间)] 字符串列表
+    窗口按自然天/小时对齐，结束时间为下一窗口开始前一秒
     """
-    # 初始化数据库连接
-    await Tortoise.init(config=TORTOISE_ORM)
+    start, end = to_datetime(start_time), to_datetime(end_time)
+    if split_by == "hour":
+        step = timedelta(hours=1)
+        boundary = start.replace(minute=0, second=0, microsecond=0)
+    else:
+        step = timedelta(days=1)
+        boundary = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    windows = []
+    current = start
+    while current <= end:
+        boundary += step
+        window_end = min(boundary - timedelta(seconds=1), end)
+        windows.append(
+            (current.strftime(TIME_FORMAT), window_end.strftime(TIME_FORMAT)))
+        current = boundary
+    return windows
+
+
+def window_name(start_time, end_time):
+    """时间窗口的同步状态名称"""
+    return f"window:{start_time}~{end_time}"
+
+
+async def get_finished_windows(names):
+    """查询已成功同步的时间窗口"""
+    return set(await SyncState.filter(
+        name__in=names, status="success").values_list("name", flat=True))
+
+
+# 增量获取mb订单任务
+@celery_app.task
+def get_incremental_orders():
+    result = run_async(sync_incremental_orders())
+    return result
 
+
+async def sync_orders(start_time, end_time):
+    """
+    同步指定付款时间范围内的mb订单(需已初始化数据库连接)
+    """
     try:
         # 获取第一页数据确定总页数
+        request_start = time.perf_counter()
         first_page = send_order_requests(start_time, end_time, 1)
-        soup = BeautifulSoup(first_page.content, 'html.parser')
-        error_p = soup.find('p')
-
+        page_latency = {1: round(time.perf_counter() - request_start, 3)}
         if first_page.status_code != 200:
             return {"status": "error", "message": "获取订单失败"}
-        if error_p and error_p.text == '错误原因：您的登录信息已超时，请刷新页面后重试':
-            return {"status": "error", "message": "cookies过期"}
-
-        orders_data = first_page.json()
-        total_page = math.ceil(orders_data['pageCount'] / 500)
-        all_orders = orders_data.get('orderDataList', [])
-
-        # 获取剩余页数据
-        for page in range(2, total_page + 1):
-            response = send_order_requests(start_time, end_time, page)
-            if response.status_code == 200:
-                page_data = response.json()
-                all_orders.extend(page_data.get('orderDataList', []))
-
-        create_num = 0  # 新增订单数量
-        update_num = 0  # 更新订单数量
-        # 处理所有订单数据
-        for order in all_orders:
-            # 物流信息
-            carrier_name = ''
-            carrier_company = ''
-            cansend1logisticsHtml = order['cansend1logisticsHtml']
-            soup = BeautifulSoup(cansend1logisticsHtml, 'html.parser')
-            p_tag = soup.find('p')
-            if p_tag:
-                text = p_tag.get_text()
-                if text != '物流渠道未选择':
-                    parts = text.split('[')
-                    carrier_name = parts[0]
-                    carrier_company = parts[1].replace(']', '')
-
-            od = await Orders.filter(order_number=order['platformOrderId']
-                                     ).first()
-            mark_update = False  # 标记是否已更新订单
-            if od:
-                # 订单更新了发货状态 --> 更新所有可能变化的字段
-                if od.order_status != order['showOrderStatusText'] and order[
-                        'showOrderStatusText'] == '已发货':
-                    od.order_status = order['showOrderStatusText']
-                    # 使用全局健壮时间解析函数处理发货时间
-                    if order['expressTime'] != '--':
-                        if 'expressTimezone' in order and order['expressTimezone'] and order['expressTimezone'] != '--':
-                            od.order_sent_time = robust_time_parse(order['expressTimezone'])  # type: ignore
-                        else:
-                            od.order_sent_time = robust_time_parse(order['expressTime'])  # type: ignore
-                    else:
-                        od.order_sent_time = None  # type: ignore
-                    od.carrier_company = carrier_company  # 物流公司名称
-                    od.carrier_name = carrier_name  # 承运商名称
-                    od.tracking_number = order['trackNumber']  # 物流跟踪号
-                    od.buyer_name = order['buyerName']  # 买家姓名
-                    od.country = order['countryCodeEn']  # 国家(英文)
-                    od.state = order['province']  # 省/州
-                    od.city = order['city']  # 城市
-                    od.post_code = order['postCode']  # 邮编
-                    od.address = order['street1'] + order[
-                        'street2']  # 地址(街道1+街道2)
-                    od.email = order['email']  # 买家邮箱
-                    od.order_note = order['orderRemarkText']  # 订单备注
-                    od.is_change_confirm = True  # 变更是否确认
-                    await od.save()
-                    mark_update = True
-                # 仅订单状态变化
-                if od.order_status != order['showOrderStatusText']:
-                    od.order_status = order['showOrderStatusText']
-                    od.is_refund = True if order[
-                        'isRefund'] == 1 else False  # 是否退款
-                    await od.save()
-                    mark_update = True
-                # 仅物流信息变化
-                if od.carrier_name != carrier_name or od.tracking_number != order[
-                        'trackNumber']:
-                    od.carrier_name = carrier_name  # 承运商名称
-                    od.carrier_company = carrier_company  # 物流公司名称
-                    od.tracking_number = order['trackNumber']  # 物流跟踪号
-                    await od.save()
-                    mark_update = True
-                if mark_update:
-                    update_num += 1  # 更新订单数量
-                continue
-            # 这里可以添加订单处理逻辑
-            orders = Orders()
-            # 订单基础信息
-            orders.order_id = order['id']  # 订单ID（系统内部）
-            orders.is_refund = True if order['isRefund'] == 1 else False  # 是否退款
-            orders.order_number = order['platformOrderId']  # 平台订单号
-            orders.platform_number = order['salesRecordNumber']  # 销售记录号
-            orders.platform_status = order['platform_order_status']  # 平台订单状态
-            if '_' in order['platformOrderId']:
-                orders.is_resent = True  # 是否重发订单
-
-            # 订单备注信息
-            orders.order_note = order['orderRemarkText']  # 订单备注
-
-            # 处理付款时间
-            if 'paidTimeTimezone' in order and order['paidTimeTimezone'] and order['paidTimeTimezone'] != '--':
-                orders.paid_time = robust_time_parse(order['paidTimeTimezone'])
-            else:
-                orders.paid_time = robust_time_parse(order['paidTime'])
-            
-            # 处理发货时间
-            if order['expressTime'] != '--':
-                if 'expressTimezone' in order and order['expressTimezone'] and order['expressTimezone'] != '--':
-                    orders.order_sent_time = robust_time_parse(order['expressTimezone'])  # type: ignore
-                else:
-                    orders.order_sent_time = robust_time_parse(order['expressTime'])  # type: ignore
-            else:
-                orders.order_sent_time = None  # type: ignore
-            
-            # 处理创建时间
-            if 'createDateTimezone' in order and order['createDateTimezone'] and order['createDateTimezone'] != '--':
-                orders.create_time = robust_time_parse(order['createDateTimezone'])
-            else:
-                orders.create_time = robust_time_parse(order['createDate'])
-            
-            # 处理订单交付时间
-            if 'orderDeliverTimezone' in order and order['orderDeliverTimezone'] and order['orderDeliverTimezone'] != '--':
-                orders.order_deliver_time = robust_time_parse(order['orderDeliverTimezone'])  # type: ignore
-
-            orders.carrier_company = carrier_company  # 物流公司名称
-            orders.carrier_name = carrier_name  # 承运商名称
-            orders.selected_carrier = order['shippingService']  # 选择的物流服务
-            orders.tracking_number = order['trackNumber']  # 物流跟踪号
-
-            # 店铺和平台信息
-            orders.country_code = order['countryCode']  # 国家代码
-            orders.store_name = order['shopIdText']  # 店铺名称
-            orders.platform = order['platformIdText']  # 平台名称
-
-            # 订单状态和重量
-            orders.order_weight = order['orderWeight']  # 订单重量
-            orders.order_status = order['showOrderStatusText']  # 订单状态显示文本
-
-            # 买家信息
-            orders.buyer_id = order['buyerUserId']  # 买家ID
-            orders.buyer_name = order['buyerName']  # 买家姓名
-            orders.country = order['countryCodeEn']  # 国家(英文)
-            orders.state = order['province']  # 省/州
-            orders.city = order['city']  # 城市
-            orders.post_code = order['postCode']  # 邮编
-            orders.address = order['street1'] + order['street2']  # 地址(街道1+街道2)
-            orders.email = order['email']  # 买家邮箱
-
-            # 价格信息
-            # 在orders.save()之前添加以下转换逻辑
-            orders.postage_in_f = float(order['shippingFee_original'].replace(
-                ',', '')) if order['shippingFee_original'] else 0.0  # 原始运费(外币)
-            orders.postage_in_rmb = float(order['shippingFee'].replace(
-                ',', '')) if order['shippingFee'] else 0.0  # 运费(人民币)
-            orders.postage_out_rmb = float(order['shippingCost'].replace(
-                'RMB', '').replace(
-                    ',',
-                    '')) if order['shippingCost'] else 0.0  # 实际运费成本(去除RMB字符)
-            orders.order_price_f = float(
-                order['accountOrderFee_original'].replace(',', '')
-            ) if order['accountOrderFee_original'] else 0.0  # 订单总价(外币)
-            orders.order_price_rmb = float(order['accountOrderFee'].replace(
-                ',', '')) if order['accountOrderFee'] else 0.0  # 订单总价(人民币)
-            orders.currency = order['currencyId']  # 货币类型
-            orders.profit_rmb = float(order['profit'].replace(
-                ',', '')) if order['profit'] else 0.0  # 利润(人民币)
-            orders.profit_f = float(order['profit_original'].replace(
-                ',', '')) if order['profit_original'] else 0.0  # 利润(外币)
-
-            orders.margin = order['profit_rate']  # 利润率
-
-            # 平台备注
-            orders.platform_note = order['buyerMessageText'][:500] if order[
-                'buyerMessageText'] else None  # 买家留言/平台备注(截取前500字符)
-            await orders.save()
-            create_num += 1  # 新增订单数量+1
-
-        id_list = []
-        for order in all_orders:
-            id_list.append(order['id'])
-
-        # 分批处理并收集所有订单商品数据
-        # 使用字典存储商品数据，键为订单ID
-        all_items = {}
-        batch_size = 1000  # 每批处理的订单数量
-        for i in range(0, len(id_list), batch_size):
-            batch_ids = id_list[i:i + batch_size]
-            order_ids = ','.join(batch_ids)
-            if order_ids:
-                response = send_item_requests(order_ids)
-                if response.status_code == 200:
-                    order_items = response.json()
-                    items = order_items.get('order_list_html_header', {})
-                    # 合并字典数据
-                    for order_id, item_data in items.items():
-                        all_items[order_id] = item_data
-
-        # 统一处理所有商品数据
-        for order_id, items in all_items.items():
-            od = await Orders.filter(order_id=order_id).first()
-            if od:
-                if od.is_change_confirm:
-                    # 订单更新了发货状态 --> 删除所有商品数据，不管有没有变化，都重新
-                    await OrderItems.filter(order=od).delete()
-                    od.sku_total_qty = 0
-                    od.is_change_confirm = False
-                    await od.save()
-                if od.sku_total_qty:
-                    # 订单商品项已经更新过了，跳过
-                    continue
-                # 解析商品数据
-                soup = BeautifulSoup(items, 'html.parser')
-                tr_tags = soup.find_all('tr')
-                for tr in tr_tags:
-                    # 获取 SKU 编号
-                    sku_tag = tr.find('a',
-                                      attrs={"data-copy-id":
-                                             "copySkuNumber"})  # type: ignore
-                    sku = sku_tag.text  # type: ignore
-                    # 获取图片
-                    img_tag = tr.find('img')  # type: ignore
-                    img_src = img_tag.get('src')  # type: ignore
-                    # 获取数量
-                    qty_tag = tr.find(
-                        'span', class_='stock-product-nums')  # type: ignore
-                    qty = qty_tag.text  # type: ignore
-                    # 获取item id 和 url
-                    item_id_tag = sku_tag.find_next('a')  # type: ignore
-                    item_id = item_id_tag.text if item_id_tag else ''  # type: ignore
-                    item_url = item_id_tag[
-                        'href'] if item_id_tag else ''  # type: ignore
-                    # 获取商品名称
-                    item_name_tag = tr.find(
-                        'span',  # type: ignore
-                        attrs={"data-field": "productName"})  # type: ignore
-                    item_name = item_name_tag['title']
-                    # 获取商品规格
-                    specifics_tag = tr.find('p',
-                                            attrs={"data-field": "specifics"})
-                    specifics = specifics_tag['data-original-title'].replace(
-                        "<br/>", ",")
-                    # 获取商品成本价格
-                    price_td = tr.find('td', attrs={"data-field": "sellPrice"})
-                    if price_td:
-                        price_p = price_td.find('p')
-                        if price_p:
-                            price = price_p.text.strip()
-
-                    await OrderItems.create(order=od,
-                                            item_id=item_id,
-                                            item_url=item_url,
-                                            platform_property=specifics,
-                                            sku=sku,
-                                            item_name=item_name,
-                                            item_qty=int(qty),
-                                            image_url=img_src,
-                                            item_cost=float(price))
-                # 更新订单商品总数量
-                od.sku_total_qty = len(tr_tags)
-                await od.save()
+        try:
+            orders_data = first_page.json()
+        except ValueError:
+            # 登录超时时返回的是html错误页
+            if first_p_text(first_page.text) == '错误原因：您的登录信息已超时，请刷新页面后重试':
+                return {"status": "error", "message": "cookies过期"}
+            raise
+        total_page = math.ceil(orders_data['pageCount'] / ROWS_PER_PAGE)
+        first_orders = orders_data.get('orderDataList', [])
+
+        # 流式处理剩余页: 订单与商品逐页写入
+        stats = await run_sync_pipeline(start_time, end_time, first_orders,
+                                        total_page)
+        page_latency.update(stats['page_latency'])
+        max_paid_time = stats['max_paid_time']
+        message = f"获取到 {stats['orders']} 个订单数据，新增 {stats['created']} 个，更新 {stats['updated']} 个"
+        # 有分页或商品获取失败时为部分成功，不推进同步水位，窗口重跑时会再次同步
+        fetch_failures = len(
+            stats['failed_pages']) + stats['failed_item_orders']
+        if fetch_failures:
+            message += f"，{len(stats['failed_pages'])} 页订单和 {stats['failed_item_orders']} 个订单的商品获取失败"
 
         return {
-            "status":
-            "success",
-            "message":
-            f"获取到 {len(all_orders)} 个订单数据，新增 {create_num} 个，更新 {update_num} 个"
+            "status": "partial" if fetch_failures else "success",
+            "message": message,
+            "created": stats['created'],
+            "updated": stats['updated'],
+            "fetch_failures": fetch_failures,
+            "failed_pages": stats['failed_pages'],
+            "failed_item_orders": stats['failed_item_orders'],
+            "max_paid_time":  # 本次同步到的最大付款时间
+            max_paid_time.strftime("%Y-%m-%d %H:%M:%S")
+            if max_paid_time else None,
+            "page_latency": page_latency  # 每页请求耗时(秒)
         }
     except Exception as e:
         return {"status": "error", "message": str(e)}
+
+
+def sync_lock_names(start_time, end_time):
+    """同步范围覆盖的每个付款小时的锁名称，按时间排序(各任务按相同顺序加锁，不会互相等待死锁)"""
+    hour = to_datetime(start_time).replace(minute=0, second=0, microsecond=0)
+    end = to_datetime(end_time)
+    names = []
+    while hour <= end:
+        names.append(SYNC_LOCK_NAME.format(hour=hour.strftime("%Y-%m-%dT%H")))
+        hour += timedelta(hours=1)
+    return names
+
+
+@asynccontextmanager
+async def hold_sync_locks(start_time, end_time, wait=False):
+    """
+    获取同步范围内所有付款小时的锁，同时写入相同订单的任务会重复创建订单
+    参数:
+        wait: 锁被占用时是否等待，否则立即返回
+    返回: 是否获取到全部锁
+    """
+    client = celery_app.backend.client
+    locks, acquired = [], True
+    try:
+        for name in sync_lock_names(start_time, end_time):
+            # 在工作线程中等待锁，令牌不能保存在线程本地变量中
+            lock = client.lock(name,
+                               timeout=SYNC_LOCK_TIMEOUT,
+                               thread_local=False)
+            if not await asyncio.to_thread(lock.acquire,
+                                           blocking=wait,
+                                           blocking_timeout=SYNC_LOCK_WAIT):
+                acquired = False
+                break
+            locks.append(lock)
+    except BaseException:
+        release_locks(locks)
+        raise
+    renew = asyncio.create_task(renew_locks(locks)) if acquired else None
+    try:
+        yield acquired
     finally:
-        await Tortoise.close_connections()
+        if renew is not None:
+            renew.cancel()
+            await asyncio.gather(renew, return_exceptions=True)
+        release_locks(locks)
 
 
-# 发送请求获取订单数据
-def send_order_requests(start_time, end_time, page):
-    config = load_config()
-    headers = {
-        "cookie": config["cookie"],
-        "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8"
-    }
-    form_data = {
-        "queryTime": "paidTime",
-        "startTime1": start_time,
-        "endTime1": end_time,
-        "page": page,
-        "rowsPerPage": "500",
-        "a": "orderalllist",
-        "TextZx": "",
-        "TextZd": "",
-        "post_tableBase": "1"
-    }
-    # 定义API URL
-    api_url = "https://vip.mabangerp.com/index.php?mod=order.oTc"
-    # 发送GET请求
-    response = requests.post(api_url, headers=headers, data=form_data)
-    return response
-
-
-# 发送请求获取订单商品数据
-def send_item_requests(order_ids):
-    config = load_config()
-    headers = {
-        "cookie": config["cookie"],
-        "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8"
-    }
-    form_data = {"orderItemIq": order_ids, "tableBase": 2, "isAllList": 1}
-    # 定义API URL
-    api_url = "https://vip.mabangerp.com/index.php?mod=order.showOrderItems"
-    # 发送GET请求
-    response = requests.post(api_url, headers=headers, data=form_data)
-    return response
+async def renew_locks(locks):
+    """同步期间定期把锁的过期时间重置为 SYNC_LOCK_TIMEOUT，长时间同步不会丢失锁"""
+    while True:
+        await asyncio.sleep(SYNC_LOCK_RENEW_INTERVAL)
+        # 大范围同步持有的小时锁较多，在一个工作线程中依次续期
+        await asyncio.to_thread(reacquire_locks, locks)
+
+
+def reacquire_locks(locks):
+    """重置锁的过期时间，锁已丢失时只记录日志"""
+    for lock in locks:
+        try:
+            lock.reacquire()
+        except LockError as e:
+            print(f"同步锁续期失败 {lock.name}: {str(e)}")
+
+
+def release_locks(locks):
+    """释放锁，锁已过期或被其他任务获取时只记录日志，不影响后续保存同步状态"""
+    for lock in reversed(locks):
+        try:
+            lock.release()
+        except LockError as e:
+            print(f"同步锁释放失败 {lock.name}: {str(e)}")
+
+
+async def sync_orders_locked(start_time, end_time, wait=False):
+    """持有同步锁时同步订单，锁被占用且不等待时跳过"""
+    async with hold_sync_locks(start_time, end_time, wait) as acquired:
+        if not acquired:
+            return {
+                "status": "skipped",
+                "message": "已有同步任务正在运行",
+                "window": [str(start_time), str(end_time)]
+            }
+        return await sync_orders(start_time, end_time)
+
+
+async def sync_with_checkpoint(name, start_time, end_time, wait=False):
+    """
+    同步订单并记录同步状态
+    全部获取成功时才推进付款时间水位(只增不减)并记录运行时间；
+    部分成功(partial)或失败时保留原水位，只记录状态和错误信息
+    参数:
+        wait: 付款时间重叠的同步任务正在运行时是否等待，否则直接跳过
+    """
+    result = await sync_orders_locked(start_time, end_time, wait)
+    if result["status"] == "skipped":
+        return result
+
+    state, _ = await SyncState.get_or_create(name=name)
+    state.status = result["status"]
+    state.message = result["message"][:200]
+    # 有分页或商品获取失败时保留原水位，下次同步重新获取这段时间的订单
+    if result["status"] == "success" and not result.get("fetch_failures"):
+        state.last_run_time = datetime.now()
+        if result["max_paid_time"]:
+            max_paid_time = datetime.strptime(result["max_paid_time"],
+                                              "%Y-%m-%d %H:%M:%S")
+            last_paid_time = state.last_paid_time.replace(
+                tzinfo=None) if state.last_paid_time else None
+            if not last_paid_time or max_paid_time > last_paid_time:
+                state.last_paid_time = max_paid_time
+    await state.save()
+    result["window"] = [str(start_time), str(end_time)]
+    return result
+
+
+async def sync_incremental_orders():
+    """
+    增量同步: 只获取上次付款时间水位之后(带少量重叠)的订单
+    没有水位时从 MB_INCREMENTAL_INITIAL_DAYS 天前开始
+    """
+    state = await SyncState.get_or_none(name=INCREMENTAL_SYNC_NAME)
+
+    end_time = datetime.now().replace(microsecond=0)
+    if state and state.last_paid_time:
+        start_time = state.last_paid_time.replace(tzinfo=None) - timedelta(
+            minutes=config.MB_INCREMENTAL_OVERLAP_MINUTES)
+    else:
+        start_time = end_time - timedelta(
+            days=config.MB_INCREMENTAL_INITIAL_DAYS)
+    return await sync_with_checkpoint(INCREMENTAL_SYNC_NAME,
+                                      start_time.strftime("%Y-%m-%d %H:%M:%S"),
+                                      end_time.strftime("%Y-%m-%d %H:%M:%S"))
 
 
 @celery_app.task
@@ -422,8 +342,6 @@ def get_day_orders_report_task():
     """
 
     async def _async_task():
-        # 初始化数据库连接
-        await Tortoise.init(config=TORTOISE_ORM)
         try:
             end_date = (datetime.now() -
                         timedelta(days=1)).strftime("%Y-%m-%d")
@@ -509,7 +427,7 @@ def get_day_orders_report_task():
                 SUM(order_price_rmb) AS total_amount
             FROM orders
             WHERE 
-                DATE(paid_time) = '{end_date}'
+                paid_time >= '{end_date}' AND paid_time < DATE_ADD('{end_date}', INTERVAL 1 DAY)
             """
             total_result = await connection.execute_query_dict(total_query)
             total_stats = {
@@ -530,7 +448,7 @@ def get_day_orders_report_task():
             FROM orders o
             JOIN items oi ON o.id = oi.order_id
             WHERE 
-                DATE(o.paid_time) = '{end_date}'
+                o.paid_time >= '{end_date}' AND o.paid_time < DATE_ADD('{end_date}', INTERVAL 1 DAY)
             GROUP BY oi.sku, oi.item_name, oi.image_url
             ORDER BY total_qty DESC
             LIMIT 5
@@ -563,7 +481,7 @@ def get_day_orders_report_task():
             FROM orders o
             JOIN items oi ON o.id = oi.order_id
             WHERE 
-                DATE(o.paid_time) = '{end_date}'
+                o.paid_time >= '{end_date}' AND o.paid_time < DATE_ADD('{end_date}', INTERVAL 1 DAY)
             GROUP BY oi.item_id  # 仅按item_id分组
             ORDER BY order_count DESC
             LIMIT 5
@@ -594,7 +512,7 @@ def get_day_orders_report_task():
                 currency
             FROM orders
             WHERE 
-                DATE(paid_time) = '{end_date}'
+                paid_time >= '{end_date}' AND paid_time < DATE_ADD('{end_date}', INTERVAL 1 DAY)
             ORDER BY order_price_rmb DESC
             LIMIT 5
             """
@@ -621,7 +539,7 @@ def get_day_orders_report_task():
                 COUNT(order_id) AS order_count
             FROM orders
             WHERE 
-                DATE(paid_time) = '{end_date}'
+                paid_time >= '{end_date}' AND paid_time < DATE_ADD('{end_date}', INTERVAL 1 DAY)
                 AND carrier_name IS NOT NULL
             GROUP BY carrier_name
             ORDER BY order_count DESC
@@ -647,7 +565,7 @@ def get_day_orders_report_task():
                 SUM(order_price_rmb) AS total_amount
             FROM orders
             WHERE 
-                DATE(paid_time) = '{end_date}'
+                paid_time >= '{end_date}' AND paid_time < DATE_ADD('{end_date}', INTERVAL 1 DAY)
                 AND country_code IS NOT NULL
             GROUP BY country_code
             ORDER BY order_count DESC
@@ -723,11 +641,9 @@ def get_day_orders_report_task():
         except Exception as e:
             print(f"获取订单数据出错: {str(e)}")
             return {"status": "error", "message": str(e)}
-        finally:
-            await Tortoise.close_connections()
 
-    # 运行异步函数并返回结果
-    return asyncio.run(_async_task())
+    # 在worker事件循环中运行异步函数并返回结果
+    return run_async(_async_task())
 
 
 @celery_app.task
@@ -737,8 +653,6 @@ def get_week_orders_report_task():
     """
 
     async def _async_task():
-        # 初始化数据库连接
-        await Tortoise.init(config=TORTOISE_ORM)
         try:
             # 获取上周一和上周日的日期
             today = datetime.now()
@@ -1080,8 +994,6 @@ def get_week_orders_report_task():
         except Exception as e:
             print(f"获取订单数据出错: {str(e)}")
             return {"status": "error", "message": str(e)}
-        finally:
-            await Tortoise.close_connections()
 
-    # 运行异步函数并返回结果
-    return asyncio.run(_async_task())
+    # 在worker事件循环中运行异步函数并返回结果
+    return run_async(_async_task())
@@ -1,8 +1,13 @@
+import asyncio
+import os
 import sys
 from pathlib import Path
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_init, worker_process_shutdown
+from tortoise import Tortoise
 from config import config
+from database import TORTOISE_ORM
 
 REDIS_HOST = config.REDIS_HOST
 REDIS_PORT = config.REDIS_PORT
@@ -21,8 +26,13 @@ celery_app.conf.enable_utc = False  # 禁用UTC
 
 # 配置定时任务
 celery_app.conf.beat_schedule = {
+    'get-incremental-orders': {
+        'task': 'apps.mb.tasks.get_incremental_orders',  # 增量获取订单
+        'schedule': crontab(minute='*/5'),  # 每5分钟执行
+        'args': ()
+    },
     'get-oneweek-orders-daily': {
-        'task': 'apps.mb.tasks.get_oneweek_orders',  # 获取最近7天订单
+        'task': 'apps.mb.tasks.get_oneweek_orders',  # 获取最近7天订单(状态巡检)
         'schedule': crontab(minute='30', hour='0'),  # 每天0点30分执行
         'args': ()  # 可以在这里添加任务参数
     },
@@ -39,4 +49,55 @@ celery_app.conf.beat_schedule = {
 }
 
 # 自动发现各个 app 中的任务
-celery_app.autodiscover_tasks(['apps.mb'])
+celery_app.autodiscover_tasks(['apps.mb', 'apps.logistic'])
+
+# worker进程内长期复用的事件循环(已初始化数据库连接)
+_worker_loop = None
+_worker_loop_pid = None
+
+
+def get_worker_loop():
+    """
+    获取当前进程的事件循环，首次调用时创建并初始化 Tortoise
+    数据库连接池随事件循环在进程内复用，任务不再各自初始化和关闭连接
+    """
+    global _worker_loop, _worker_loop_pid
+    if _worker_loop is None or _worker_loop_pid != os.getpid():
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(Tortoise.init(config=TORTOISE_ORM))
+        except BaseException:
+            loop.close()
+            raise
+        asyncio.set_event_loop(loop)
+        _worker_loop = loop
+        _worker_loop_pid = os.getpid()
+    return _worker_loop
+
+
+def run_async(coro):
+    """
+    在当前进程的事件循环中运行异步任务并返回结果
+    (prefork/solo 模式下每个进程同一时间只运行一个任务)
+    """
+    return get_worker_loop().run_until_complete(coro)
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """worker子进程启动时初始化事件循环和数据库连接"""
+    try:
+        get_worker_loop()
+    except Exception as e:
+        # 数据库暂不可用时不影响worker启动，首个任务运行时会再次初始化
+        print(f"worker初始化数据库连接失败: {str(e)}")
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    """worker子进程退出时关闭数据库连接和事件循环"""
+    global _worker_loop
+    if _worker_loop is not None and _worker_loop_pid == os.getpid():
+        _worker_loop.run_until_complete(Tortoise.close_connections())
+        _worker_loop.close()
+    _worker_loop = None
@@ -9,6 +9,7 @@ class Settings(BaseSettings):
     MYSQL_USER: str = "root"
     MYSQL_PASSWORD: str = "123456"
     MYSQL_DATABASE: str = "mbdata"
+    MYSQL_LOCAL_INFILE: bool = False  # 导入物流数据时使用 LOAD DATA LOCAL INFILE(需要MySQL开启 local_infile)
     # redis配置
     REDIS_HOST: str
     REDIS_PORT: int = 6379
@@ -16,6 +17,24 @@ class Settings(BaseSettings):
     FASTAPI_DEBUG: bool
     # 订单日报接口配置
     MB_DAY_REPORT_URL: str
+    # 马帮ERP配置
+    MB_ERP_URL: str = "https://vip.mabangerp.com"  # ERP地址(可指向本地模拟服务)
+    MB_FETCH_CONCURRENCY: int = 4  # 订单分页并发请求数
+    MB_PIPELINE_QUEUE_SIZE: int = 2  # 同步流水线各阶段队列长度
+    MB_INCREMENTAL_OVERLAP_MINUTES: int = 30  # 增量同步向前重叠的分钟数
+    MB_INCREMENTAL_INITIAL_DAYS: int = 7  # 无同步水位时的初始同步天数
+    MB_ERP_RATE: float = 5.0  # ERP每秒请求数上限(所有worker共享)
+    MB_ERP_BURST: int = 10  # ERP令牌桶容量
+    MB_ERP_CONNECT_TIMEOUT: float = 10  # ERP连接超时(秒)
+    MB_ERP_READ_TIMEOUT: float = 120  # ERP读取超时(秒)
+    MB_ERP_TARGET_LATENCY: float = 30  # 响应超过该时间(秒)时降低并发
+    MB_ERP_MAX_RETRIES: int = 3  # ERP请求失败重试次数
+    MB_ERP_RETRY_BASE_DELAY: float = 1  # 重试退避基础时间(秒)
+    MB_ERP_RETRY_MAX_DELAY: float = 30  # 重试退避最长时间(秒)
+    # 运费缓存配置
+    QUOTE_CACHE_SIZE: int = 20000  # 进程内缓存记录数上限
+    QUOTE_CACHE_TTL: int = 600  # 缓存有效时间(秒)
+    QUOTE_CACHE_REDIS: bool = True  # 是否使用Redis共享缓存
 
     model_config = SettingsConfigDict(env_file=".env",
                                       env_file_encoding="utf-8",
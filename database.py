@@ -6,6 +6,7 @@ MYSQL_PORT = config.MYSQL_PORT
 MYSQL_USER = config.MYSQL_USER
 MYSQL_PASSWORD = config.MYSQL_PASSWORD
 MYSQL_DATABASE = config.MYSQL_DATABASE
+MYSQL_LOCAL_INFILE = config.MYSQL_LOCAL_INFILE
 
 # 数据库相关模型类
 TORTOISE_MODELS = ["aerich.models", "apps.mb.models", "apps.logistic.models"]
@@ -21,6 +22,8 @@ TORTOISE_ORM = {
                 "user": MYSQL_USER,
                 "password": MYSQL_PASSWORD,
                 "database": MYSQL_DATABASE,
+                "pool_recycle": 3600,  # 长期运行的worker定期重建空闲连接，避免被MySQL断开
+                "local_infile": MYSQL_LOCAL_INFILE,  # 允许客户端发送本地文件(LOAD DATA LOCAL INFILE)
             },
         }
     },
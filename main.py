@@ -1,10 +1,26 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from tortoise.contrib.fastapi import register_tortoise
 from router import routers
 from database import TORTOISE_ORM
 from config import config
+from apps.logistic.rates import load_rate_table
+from apps.logistic.zones import load_zone_index
 
-app = FastAPI(debug=config.FASTAPI_DEBUG, )
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """启动时加载内存邮编分区索引和运费表(在数据库初始化之后执行)"""
+    try:
+        await load_zone_index()
+        await load_rate_table()
+    except Exception as e:
+        # 加载失败不影响启动，首次查询时会再次加载
+        print(f"加载分区索引/运费表失败: {str(e)}")
+    yield
+
+
+app = FastAPI(debug=config.FASTAPI_DEBUG, lifespan=lifespan)
 # 注册路由
 app.include_router(routers)
 
@@ -0,0 +1,31 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS `import_job` (
+    `id` INT NOT NULL PRIMARY KEY AUTO_INCREMENT,
+    `table` VARCHAR(20) NOT NULL COMMENT '导入的表(area_code/post_price)',
+    `mode` VARCHAR(10) NOT NULL COMMENT '导入方式(replace/diff/swap)',
+    `file_name` VARCHAR(200) NOT NULL COMMENT '上传的文件名',
+    `file_path` VARCHAR(300) NOT NULL COMMENT '保存的文件路径',
+    `file_size` BIGINT NOT NULL COMMENT '文件大小(字节)' DEFAULT 0,
+    `sha256` VARCHAR(64) NOT NULL COMMENT '文件内容哈希',
+    `status` VARCHAR(20) NOT NULL COMMENT '状态(pending/running/success/failed)' DEFAULT 'pending',
+    `task_id` VARCHAR(50) COMMENT 'Celery任务ID',
+    `rows_parsed` INT NOT NULL COMMENT '已解析行数' DEFAULT 0,
+    `rows_written` INT NOT NULL COMMENT '已写入行数' DEFAULT 0,
+    `rows_skipped` INT NOT NULL COMMENT '跳过的无效行数' DEFAULT 0,
+    `rows_per_sec` DOUBLE COMMENT '每秒处理行数',
+    `result` JSON COMMENT '导入统计',
+    `message` VARCHAR(500) COMMENT '结果信息',
+    `create_time` DATETIME(6) NOT NULL COMMENT '创建时间' DEFAULT CURRENT_TIMESTAMP(6),
+    `start_time` DATETIME(6) COMMENT '开始时间',
+    `finish_time` DATETIME(6) COMMENT '完成时间',
+    KEY `idx_import_job_sha256_137c4e` (`sha256`)
+) CHARACTER SET utf8mb4 COMMENT='物流数据导入任务表';"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS `import_job`;"""
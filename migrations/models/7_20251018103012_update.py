@@ -0,0 +1,18 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS `sync_state` (
+    `id` INT NOT NULL PRIMARY KEY AUTO_INCREMENT,
+    `name` VARCHAR(100) NOT NULL UNIQUE COMMENT '同步任务名称',
+    `last_paid_time` DATETIME(6) COMMENT '已同步的最大付款时间',
+    `last_run_time` DATETIME(6) COMMENT '最近一次成功运行时间',
+    `status` VARCHAR(20) COMMENT '最近一次运行状态',
+    `message` VARCHAR(200) COMMENT '最近一次运行结果'
+) CHARACTER SET utf8mb4 COMMENT='订单同步状态表';"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS `sync_state`;"""
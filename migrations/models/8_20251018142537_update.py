@@ -0,0 +1,11 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE `orders` ADD `payload_hash` VARCHAR(32) COMMENT 'ERP订单数据哈希';"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE `orders` DROP COLUMN `payload_hash`;"""
@@ -0,0 +1,21 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE `orders` ADD INDEX `idx_orders_order_n_364fea` (`order_number`);
+        ALTER TABLE `orders` ADD INDEX `idx_orders_order_i_75d4e0` (`order_id`);
+        ALTER TABLE `orders` ADD INDEX `idx_orders_paid_ti_9a72dc` (`paid_time`);
+        ALTER TABLE `orders` ADD INDEX `idx_orders_store_n_8e46b8` (`store_name`, `paid_time`);
+        ALTER TABLE `area_code` ADD INDEX `idx_area_code_country_088a6d` (`country_code`, `post_code`);
+        ALTER TABLE `post_price` ADD INDEX `idx_post_price_carrier_20fba1` (`carrier_code`, `area`, `min_weight`, `max_weight`);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE `orders` DROP INDEX `idx_orders_order_n_364fea`;
+        ALTER TABLE `orders` DROP INDEX `idx_orders_order_i_75d4e0`;
+        ALTER TABLE `orders` DROP INDEX `idx_orders_paid_ti_9a72dc`;
+        ALTER TABLE `orders` DROP INDEX `idx_orders_store_n_8e46b8`;
+        ALTER TABLE `area_code` DROP INDEX `idx_area_code_country_088a6d`;
+        ALTER TABLE `post_price` DROP INDEX `idx_post_price_carrier_20fba1`;"""
@@ -0,0 +1,46 @@
+"""
+订单商品/物流渠道html解析的回归测试
+fixtures 中的样例页面和期望结果以原 BeautifulSoup 实现的解析结果为基准
+"""
+import json
+from pathlib import Path
+
+import pytest
+
+from apps.mb.parsers import (first_p_text, parse_carrier, parse_items,
+                             parse_items_batch)
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def load_fixture(name):
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+def test_parse_items_matches_expected():
+    expected = json.loads(load_fixture("order_items_expected.json"))
+    assert parse_items(load_fixture("order_items.html")) == expected
+
+
+@pytest.mark.parametrize("items_html", ["", "   ", None])
+def test_parse_items_empty(items_html):
+    assert parse_items(items_html) == []
+
+
+def test_parse_items_batch_keeps_order_ids():
+    items_html = load_fixture("order_items.html")
+    result = parse_items_batch({"1001": items_html, "1002": ""})
+    assert result == {"1001": parse_items(items_html), "1002": []}
+
+
+@pytest.mark.parametrize("carrier_html, expected",
+                         json.loads(load_fixture("carriers.json")))
+def test_parse_carrier(carrier_html, expected):
+    assert parse_carrier(carrier_html) == tuple(expected)
+
+
+def test_first_p_text():
+    assert first_p_text("<div><p>错误原因：登录超时</p></div>") == "错误原因：登录超时"
+    assert first_p_text("<p>A &amp; B</p>") == "A & B"
+    assert first_p_text("<div>no paragraph</div>") is None
+    assert first_p_text("") is None
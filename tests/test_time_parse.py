@@ -0,0 +1,71 @@
+"""
+订单时间解析的回归测试: fast_time_parse 的结果(包括默认值和异常)必须与 robust_time_parse 一致
+"""
+from datetime import datetime
+
+import pytest
+
+from apps.mb.sync import (_cached_time_parse, fast_time_parse,
+                          robust_time_parse)
+
+DEFAULT = datetime(2000, 1, 1)
+
+# (时间字符串, 期望结果)，期望结果为 ValueError 表示无法解析
+CASES = [
+    (None, None),
+    ('', None),
+    ('--', None),
+    ('2025-10-18 09:30:15', datetime(2025, 10, 18, 9, 30, 15)),
+    ('2025-10-18 09:30:15(UTC+8)', datetime(2025, 10, 18, 9, 30, 15)),
+    ('2025-10-18 09:30:15 (UTC+8)', datetime(2025, 10, 18, 9, 30, 15)),
+    ('(UTC+8)2025-10-18 09:30:15', datetime(2025, 10, 18, 9, 30, 15)),
+    ('2025-10-18 09:30', datetime(2025, 10, 18, 9, 30)),
+    ('2025-10-18 09:30(UTC+8)', datetime(2025, 10, 18, 9, 30)),
+    ('2025-10-18', datetime(2025, 10, 18)),
+    ('2025-10-18(UTC+8)', datetime(2025, 10, 18)),
+    ('2025-1-8 9:3:5', datetime(2025, 1, 8, 9, 3, 5)),
+    ('2025-10-18 9:30:15', datetime(2025, 10, 18, 9, 30, 15)),
+    ('2025-10- 8 09:30:15', datetime(2025, 10, 8, 9, 30, 15)),
+    ('２０２５-10-18 09:30:15', datetime(2025, 10, 18, 9, 30, 15)),
+    ('2024-02-29 10:00:00', datetime(2024, 2, 29, 10, 0)),
+    ('2025-10-18 09:30:15  (UTC+8)', ValueError),
+    ('2025-10-18 09:30:60', ValueError),
+    ('2025-10-18 24:00:00', ValueError),
+    ('2025-02-29 10:00:00', ValueError),
+    ('2025-13-01 00:00:00', ValueError),
+    ('2025-10-18T09:30:15', ValueError),
+    ('2025-10-18 09:30:15.123', ValueError),
+    ('2025/10/18 09:30:15', ValueError),
+    ('2025-10-18 09:30:15Z', ValueError),
+    (' 2025-10-18 09:30:15', ValueError),
+    ('2025-10-18 09:30:15 ', ValueError),
+    ('2025-10-18 09:30:+5', ValueError),
+    ('2025-10-18 (UTC+8)09:30:15', ValueError),
+    ('2025-10-18 09', ValueError),
+    ('2025-10-18 09:30:15:00', ValueError),
+    ('abc', ValueError),
+]
+
+
+@pytest.mark.parametrize("time_str, expected", CASES)
+def test_robust_time_parse(time_str, expected):
+    if expected is ValueError:
+        with pytest.raises(ValueError):
+            robust_time_parse(time_str)
+        assert robust_time_parse(time_str, DEFAULT) == DEFAULT
+    else:
+        assert robust_time_parse(time_str) == expected
+
+
+@pytest.mark.parametrize("time_str, expected", CASES)
+@pytest.mark.parametrize("default", [None, DEFAULT])
+def test_fast_time_parse_matches_robust(time_str, expected, default):
+    # 无缓存和有缓存两次调用的结果都与 robust_time_parse 一致
+    _cached_time_parse.cache_clear()
+    for _ in range(2):
+        if expected is ValueError and default is None:
+            with pytest.raises(ValueError):
+                fast_time_parse(time_str, default)
+        else:
+            assert fast_time_parse(time_str, default) == robust_time_parse(
+                time_str, default)
@@ -0,0 +1,136 @@
+"""
+订单商品html解析性能对比: lxml(apps.mb.parsers) vs 原 BeautifulSoup 实现
+同时校验两者解析结果完全一致(以 BeautifulSoup 结果为基准)
+固定样例的回归测试见 tests/test_parsers.py
+
+用法:
+    python -m tools.bench_parsers                       # 使用合成数据
+    python -m tools.bench_parsers --captured items.json # 使用抓取的 showOrderItems 响应
+"""
+import argparse
+import json
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+from apps.mb.parsers import parse_carrier, parse_items
+from tools.samples import make_items_html, make_order
+
+
+def legacy_parse_items(items):
+    """原 get_mb_orders 中的 BeautifulSoup 解析逻辑"""
+    records = []
+    soup = BeautifulSoup(items, 'html.parser')
+    for tr in soup.find_all('tr'):
+        sku_tag = tr.find('a', attrs={"data-copy-id": "copySkuNumber"})
+        img_tag = tr.find('img')
+        qty_tag = tr.find('span', class_='stock-product-nums')
+        item_id_tag = sku_tag.find_next('a')
+        item_name_tag = tr.find('span', attrs={"data-field": "productName"})
+        specifics_tag = tr.find('p', attrs={"data-field": "specifics"})
+        price = None
+        price_td = tr.find('td', attrs={"data-field": "sellPrice"})
+        if price_td:
+            price_p = price_td.find('p')
+            if price_p:
+                price = price_p.text.strip()
+        records.append({
+            'sku': sku_tag.text,
+            'image_url': img_tag.get('src'),
+            'item_qty': int(qty_tag.text),
+            'item_id': item_id_tag.text if item_id_tag else '',
+            'item_url': item_id_tag['href'] if item_id_tag else '',
+            'item_name': item_name_tag['title'],
+            'platform_property': specifics_tag['data-original-title'].replace(
+                "<br/>", ","),
+            'item_cost': float(price) if price is not None else None,
+        })
+    return records
+
+
+def legacy_parse_carrier(cansend1logisticsHtml):
+    carrier_name = ''
+    carrier_company = ''
+    soup = BeautifulSoup(cansend1logisticsHtml, 'html.parser')
+    p_tag = soup.find('p')
+    if p_tag:
+        text = p_tag.get_text()
+        if text != '物流渠道未选择':
+            parts = text.split('[')
+            carrier_name = parts[0]
+            carrier_company = parts[1].replace(']', '')
+    return carrier_name, carrier_company
+
+
+def load_captured(path):
+    """读取抓取的接口响应，返回 (商品html列表, 物流html列表)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    items = list(data.get('order_list_html_header', {}).values())
+    carriers = [
+        order['cansend1logisticsHtml']
+        for order in data.get('orderDataList', [])
+    ]
+    return items, carriers
+
+
+def timed(func, values, rounds):
+    best = None
+    results = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        results = [func(value) for value in values]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+
+def compare(name, legacy_func, fast_func, values, rounds):
+    legacy_time, expected = timed(legacy_func, values, rounds)
+    fast_time, actual = timed(fast_func, values, rounds)
+    mismatches = [
+        i for i, (a, b) in enumerate(zip(expected, actual)) if a != b
+    ]
+    print(f"{name}: {len(values)} 条, BeautifulSoup {legacy_time:.3f}s, "
+          f"lxml {fast_time:.3f}s, 提速 {legacy_time / fast_time:.1f}x, "
+          f"不一致 {len(mismatches)} 条")
+    for i in mismatches[:5]:
+        print(f"  #{i}\n    期望: {expected[i]}\n    实际: {actual[i]}")
+    return not mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--captured',
+                        action='append',
+                        default=[],
+                        help='抓取的接口响应JSON文件，可重复指定')
+    parser.add_argument('--orders', type=int, default=2000, help='合成订单数量')
+    parser.add_argument('--rounds', type=int, default=3, help='重复次数(取最快)')
+    args = parser.parse_args()
+
+    items, carriers = [], []
+    for path in args.captured:
+        captured_items, captured_carriers = load_captured(path)
+        items.extend(captured_items)
+        carriers.extend(captured_carriers)
+    if not args.captured:
+        items = [make_items_html(seq) for seq in range(args.orders)]
+        carriers = [
+            make_order(seq)['cansend1logisticsHtml']
+            for seq in range(args.orders)
+        ]
+
+    ok = True
+    if items:
+        ok &= compare('商品html', legacy_parse_items, parse_items, items,
+                      args.rounds)
+    if carriers:
+        ok &= compare('物流html', legacy_parse_carrier, parse_carrier,
+                      carriers, args.rounds)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+批量报价性能对比: quote_orders(按邮编复用候选渠道) vs 逐订单逐渠道计算(原订单列表页逻辑)
+同时校验两者结果完全一致
+
+用法:
+    python -m tools.bench_quotes                      # 使用 media/load 下的分区和价格表
+    python -m tools.bench_quotes --sizes 1000 10000 100000
+    python -m tools.bench_quotes --postcodes 500      # 订单集中在500个邮编
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import openpyxl
+
+from apps.logistic.quotes import ENVELOPE_CHANNEL, GB_GENERAL_CHANNEL, quote_orders
+from apps.logistic.rates import RateTable
+from apps.logistic.zones import ZoneIndex
+
+LOAD_DIR = Path("media/load")
+
+
+def load_xlsx_rows(path):
+    """按标题行读取Excel为字典列表，并补充自增id"""
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    rows = workbook.active.iter_rows(values_only=True)
+    headers = next(rows)
+    records = [
+        dict(zip(headers, row), id=i) for i, row in enumerate(rows, 1)
+        if any(value is not None for value in row)
+    ]
+    workbook.close()
+    return records
+
+
+def load_tables():
+    zones = load_xlsx_rows(LOAD_DIR / "area_code.xlsx")
+    for row in zones:
+        row['post_code'] = None if row['post_code'] is None else str(
+            row['post_code'])
+        row['is_service'] = str(row['service']).lower() != "out of network"
+    prices = load_xlsx_rows(LOAD_DIR / "post_price.xlsx")
+    return ZoneIndex(zones), RateTable(prices)
+
+
+def make_orders(zone_index, count, postcodes=None, seed=1):
+    """
+    随机订单: 多数为已有分区的邮编，少量为英国和未知邮编
+    postcodes: 已有分区邮编只从其中随机选取的数量(模拟订单集中在少数邮编)
+    """
+    rnd = random.Random(seed)
+    keys = list(zone_index.exact.keys())
+    if postcodes:
+        keys = rnd.sample(keys, min(postcodes, len(keys)))
+    orders = []
+    for _ in range(count):
+        value = rnd.random()
+        weight = rnd.choice([0, rnd.randint(1, 3000)]) if value < 0.05 \
+            else rnd.randint(1, 3000)
+        if value < 0.85:
+            country_code, post_code = rnd.choice(keys)
+        elif value < 0.95:
+            country_code, post_code = 'GB', f"SW{rnd.randint(1, 20)} 1AA"
+        else:
+            country_code, post_code = 'AU', str(rnd.randint(10000, 99999))
+        orders.append((country_code, post_code, weight))
+    return orders
+
+
+def scalar_quotes(orders, zone_index, rate_table):
+    """原订单列表页逻辑: 逐订单查询分区，逐渠道计算运费"""
+    results = []
+    for country_code, post_code, weight in orders:
+        area_list = zone_index.lookup(country_code, post_code)
+        if country_code == 'AU':
+            area_list.append(ENVELOPE_CHANNEL)
+        post_list = []
+        if country_code == 'GB':
+            post_list.append({
+                'name': GB_GENERAL_CHANNEL['name'],
+                'area': None,
+                'is_service': True,
+                'ship_code': GB_GENERAL_CHANNEL['ship_code'],
+                'postage': rate_table.quote(None, weight, '4PX_WBP')
+            })
+        for i in area_list:
+            postage = rate_table.quote(i['area'], weight, i['ship_code'])
+            post_list.append({
+                'name': i['name'],
+                'area': i['area'],
+                'is_service': i['is_service'],
+                'ship_code': i['ship_code'],
+                'postage': postage if weight else 0
+            })
+        post_list.sort(key=lambda x: x['postage'])
+        results.append(post_list)
+    return results
+
+
+def timed(func, rounds):
+    best, result = None, None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--sizes',
+                        type=int,
+                        nargs='+',
+                        default=[1000, 10000],
+                        help='订单数量')
+    parser.add_argument('--postcodes',
+                        type=int,
+                        default=None,
+                        help='订单邮编只从这么多个已有邮编中选取(默认全部)')
+    parser.add_argument('--rounds', type=int, default=3, help='重复次数(取最快)')
+    args = parser.parse_args()
+
+    zone_index, rate_table = load_tables()
+    print(f"分区 {zone_index.rows} 条, 价格 {rate_table.rows} 条")
+    ok = True
+    for size in args.sizes:
+        orders = make_orders(zone_index, size, args.postcodes)
+        scalar_time, expected = timed(
+            lambda: scalar_quotes(orders, zone_index, rate_table), args.rounds)
+        batch_time, actual = timed(
+            lambda: quote_orders(orders, zone_index, rate_table), args.rounds)
+        mismatches = sum(1 for a, b in zip(expected, actual) if a != b)
+        ok &= mismatches == 0
+        options = sum(len(r) for r in actual)
+        print(f"{size} 个订单({options} 个渠道报价): 逐个计算 {scalar_time * 1000:.1f}ms, "
+              f"批量计算 {batch_time * 1000:.1f}ms "
+              f"(提速 {scalar_time / batch_time:.1f}x), 不一致 {mismatches} 个")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
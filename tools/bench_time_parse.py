@@ -0,0 +1,99 @@
+"""
+订单时间解析性能对比: fast_time_parse vs robust_time_parse
+同时校验两者对合成订单时间和各种边界格式的解析结果完全一致(包括异常)
+固定输入的回归测试见 tests/test_time_parse.py
+
+用法:
+    python -m tools.bench_time_parse
+    python -m tools.bench_time_parse --orders 50000 --rounds 5
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+
+from apps.mb.sync import _cached_time_parse, fast_time_parse, robust_time_parse
+from tools.samples import make_order
+
+# 订单中需要解析的时间字段(付款、发货、创建时间及其带时区版本)
+TIME_FIELDS = ('paidTime', 'paidTimeTimezone', 'expressTime',
+               'expressTimezone', 'createDate', 'createDateTimezone')
+
+# 边界格式: 各种分隔、缺省、非法值和时区写法
+EDGE_CASES = [
+    None, '', '--', '2025-10-18 09:30:15', '2025-10-18 09:30:15(UTC+8)',
+    '2025-10-18 09:30:15 (UTC+8)', '2025-10-18 09:30:15  (UTC+8)',
+    '2025-10-18 09:30', '2025-10-18 09:30(UTC+8)', '2025-10-18',
+    '2025-10-18(UTC+8)', '2025-1-8 9:3:5', '2025-10-18 9:30:15',
+    '2025-10-18 09:30:60', '2025-10-18 09:30:61', '2025-10-18 24:00:00',
+    '2025-02-29 10:00:00', '2024-02-29 10:00:00', '2025-13-01 00:00:00',
+    '2025-10-18T09:30:15', '2025-10-18 09:30:15.123', '2025/10/18 09:30:15',
+    '2025-10-18 09:30:15Z', ' 2025-10-18 09:30:15', '2025-10-18 09:30:15 ',
+    '2025-10- 8 09:30:15', '2025-10-18 09:30:+5', '２０２５-10-18 09:30:15',
+    '(UTC+8)2025-10-18 09:30:15', '2025-10-18 (UTC+8)09:30:15', 'abc',
+    '2025-10-18 09', '2025-10-18 09:30:15:00'
+]
+
+
+def call(func, value, default=None):
+    """返回 (结果, 异常类型)，用于比较两个函数的行为"""
+    try:
+        return func(value, default), None
+    except Exception as e:
+        return None, type(e).__name__
+
+
+def check_equivalence(values):
+    mismatches = []
+    default = datetime(2000, 1, 1)
+    for value in values:
+        for arg in (None, default):
+            expected = call(robust_time_parse, value, arg)
+            _cached_time_parse.cache_clear()
+            actual_cold = call(fast_time_parse, value, arg)
+            actual_warm = call(fast_time_parse, value, arg)
+            if not expected == actual_cold == actual_warm:
+                mismatches.append((value, arg, expected, actual_cold))
+    return mismatches
+
+
+def timed(func, values, rounds, clear_cache):
+    best = None
+    for _ in range(rounds):
+        if clear_cache:
+            _cached_time_parse.cache_clear()
+        start = time.perf_counter()
+        for value in values:
+            func(value)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--orders', type=int, default=20000, help='合成订单数量')
+    parser.add_argument('--rounds', type=int, default=3, help='重复次数(取最快)')
+    args = parser.parse_args()
+
+    orders = [make_order(seq) for seq in range(args.orders)]
+    values = [order[field] for order in orders for field in TIME_FIELDS]
+
+    mismatches = check_equivalence(EDGE_CASES + values[:5000])
+    print(f"一致性校验: 边界格式 {len(EDGE_CASES)} 个 + 订单时间 "
+          f"{min(len(values), 5000)} 个, 不一致 {len(mismatches)} 个")
+    for value, arg, expected, actual in mismatches[:10]:
+        print(f"  {value!r} (default={arg})\n    期望: {expected}\n    实际: {actual}")
+
+    robust_time = timed(robust_time_parse, values, args.rounds, False)
+    cold_time = timed(fast_time_parse, values, args.rounds, True)
+    warm_time = timed(fast_time_parse, values, args.rounds, False)
+    print(f"解析 {len(values)} 个时间: robust_time_parse {robust_time:.3f}s, "
+          f"fast_time_parse 无缓存 {cold_time:.3f}s "
+          f"(提速 {robust_time / cold_time:.1f}x), "
+          f"有缓存 {warm_time:.3f}s (提速 {robust_time / warm_time:.1f}x)")
+    sys.exit(0 if not mismatches else 1)
+
+
+if __name__ == '__main__':
+    main()
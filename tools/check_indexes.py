@@ -0,0 +1,121 @@
+"""
+索引检查: 对订单同步、报表和运费计算中的主要查询执行 EXPLAIN，
+任一查询全表扫描(type=ALL，无论是否有可用索引)时返回失败；
+有可用索引但优化器仍选择扫描，说明索引不适合该查询或表统计信息有误，同样需要处理
+
+用法:
+    python -m tools.check_indexes          # 使用 .env 中的 MySQL 配置
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta
+
+from tortoise import Tortoise, connections
+
+from apps.logistic.models import AreaCode, PostPrice
+from apps.mb.models import OrderItems, Orders, SyncState
+from database import TORTOISE_ORM
+
+
+async def sample_values():
+    """取库中的真实数据作为查询参数，空表时使用占位值"""
+    order = await Orders.filter(paid_time__not_isnull=True).order_by(
+        '-id').first()
+    area = await AreaCode.first()
+    price = await PostPrice.first()
+    day = order.paid_time.replace(tzinfo=None) if order else datetime.now()
+    return {
+        'order_number': order.order_number if order else '0',
+        'order_id': order.order_id if order else '0',
+        'store_name': order.store_name if order else '',
+        'day': day.strftime("%Y-%m-%d"),
+        'start': (day - timedelta(days=1)).strftime("%Y-%m-%d 00:00:00"),
+        'end': day.strftime("%Y-%m-%d 23:59:59"),
+        'country_code': area.country_code if area else 'AU',
+        'post_code': area.post_code if area else '2000',
+        'carrier_code': price.carrier_code if price else '',
+        'area': price.area if price else '1',
+        'weight': price.min_weight if price else 100,
+    }
+
+
+def main_queries(v):
+    """需要走索引的主要查询(与代码中的查询条件一致)"""
+    day_filter = (f"paid_time >= '{v['day']}' AND "
+                  f"paid_time < DATE_ADD('{v['day']}', INTERVAL 1 DAY)")
+    return {
+        '同步: 按订单编号查询':
+        Orders.filter(order_number__in=[v['order_number']]).values_list(
+            'order_number', 'payload_hash').sql(params_inline=True),
+        '同步: 按订单ID查询':
+        Orders.filter(order_id__in=[v['order_id']]).sql(params_inline=True),
+        '同步: 同步状态':
+        SyncState.filter(name__in=['orders:incremental'
+                                   ]).sql(params_inline=True),
+        '客服: 按订单编号查询':
+        Orders.filter(order_number__in=[v['order_number']]).sql(
+            params_inline=True),
+        '客服: 订单商品':
+        OrderItems.filter(order_id__in=[1]).sql(params_inline=True),
+        '报表: 付款时间范围':
+        Orders.filter(paid_time__range=(v['start'], v['end'])).sql(
+            params_inline=True),
+        '报表: 店铺每日订单':
+        f"SELECT DATE(paid_time) AS date, store_name, COUNT(id) AS count "
+        f"FROM orders WHERE paid_time BETWEEN '{v['start']}' AND '{v['end']}' "
+        f"AND store_name IN ('{v['store_name']}') GROUP BY date, store_name",
+        '报表: 当日订单汇总':
+        f"SELECT COUNT(order_id), SUM(order_price_rmb) FROM orders "
+        f"WHERE {day_filter}",
+        '报表: 当日商品销量':
+        f"SELECT oi.sku, SUM(oi.item_qty) AS total_qty FROM orders o "
+        f"JOIN items oi ON o.id = oi.order_id WHERE "
+        f"{day_filter.replace('paid_time', 'o.paid_time')} GROUP BY oi.sku",
+        '运费: 邮编分区':
+        AreaCode.filter(country_code=v['country_code'],
+                        post_code=v['post_code']).values(
+                            'name', 'area', 'is_service',
+                            'ship_code').sql(params_inline=True),
+        '运费: 物流价格':
+        PostPrice.filter(area=v['area'],
+                         carrier_code=v['carrier_code'],
+                         min_weight__lte=v['weight'],
+                         max_weight__gte=v['weight']).first().sql(
+                             params_inline=True),
+    }
+
+
+async def check():
+    await Tortoise.init(config=TORTOISE_ORM)
+    try:
+        connection = connections.get("default")
+        values = await sample_values()
+        failed = []
+        for name, query in main_queries(values).items():
+            plan = await connection.execute_query_dict(f"EXPLAIN {query}")
+            status = "OK"
+            for row in plan:
+                if row.get('type') == 'ALL':
+                    status = f"全表扫描 {row['table']}"
+                    if row.get('possible_keys'):
+                        status += f"(未使用可用索引 {row['possible_keys']})"
+                    failed.append(name)
+                    break
+            keys = ', '.join(
+                f"{row['table']}:{row.get('key') or '-'}" for row in plan)
+            print(f"{name}: {status} [{keys}]")
+        return failed
+    finally:
+        await Tortoise.close_connections()
+
+
+def main():
+    failed = asyncio.run(check())
+    if failed:
+        print(f"{len(failed)} 个查询全表扫描: {', '.join(failed)}")
+        sys.exit(1)
+    print("所有主要查询均使用索引")
+
+
+if __name__ == '__main__':
+    main()
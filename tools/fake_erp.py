@@ -0,0 +1,217 @@
+"""
+本地模拟马帮ERP服务，提供 orderalllist 订单分页和 showOrderItems 商品html接口
+可使用合成数据(任意数量)或抓取的接口响应，并可注入延迟和错误
+
+用法:
+    python -m tools.fake_erp --orders 100000                 # 合成10万个订单
+    python -m tools.fake_erp --captured orders.json --captured items.json
+    python -m tools.fake_erp --latency 200 --jitter 100 --error-rate 0.05
+
+然后设置 MB_ERP_URL=http://127.0.0.1:8765 运行同步任务
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from tools.samples import (ORDER_ID_BASE, make_items_html, make_order,
+                           seq_range)
+
+# 登录超时时ERP返回的错误页
+EXPIRED_HTML = '<html><body><p>错误原因：您的登录信息已超时，请刷新页面后重试</p></body></html>'
+
+
+class FakeErp:
+    """
+    模拟ERP的数据和故障配置
+    参数:
+        orders: 合成订单数量(未提供抓取数据时使用)
+        captured: 抓取的接口响应文件列表
+        latency: 每个请求的基础延迟(毫秒)
+        jitter: 在基础延迟上增加的随机延迟上限(毫秒)
+        error_rate: 返回500错误的概率
+        expired_rate: 返回登录超时页面的概率
+    """
+
+    def __init__(self,
+                 orders=1000,
+                 captured=(),
+                 latency=0,
+                 jitter=0,
+                 error_rate=0.0,
+                 expired_rate=0.0,
+                 seed=None):
+        self.total = orders
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.expired_rate = expired_rate
+        self.random = random.Random(seed)
+        self.captured_orders = []
+        self.captured_items = {}
+        for path in captured:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.captured_orders.extend(data.get('orderDataList', []))
+            self.captured_items.update(data.get('order_list_html_header', {}))
+        self.captured_orders.sort(key=lambda order: order['paidTime'])
+        self.stats = {'orders': 0, 'items': 0, 'errors': 0, 'expired': 0}
+        self.lock = threading.Lock()
+
+    def count(self, key, num=1):
+        with self.lock:
+            self.stats[key] += num
+
+    def fault(self):
+        """按配置等待并返回需要注入的故障: 'error' / 'expired' / None"""
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay / 1000)
+        value = self.random.random()
+        if value < self.error_rate:
+            return 'error'
+        if value < self.error_rate + self.expired_rate:
+            return 'expired'
+        return None
+
+    def order_page(self, start_time, end_time, page, rows_per_page):
+        """
+        返回: (订单总数, 当前页订单列表)
+        """
+        offset = (page - 1) * rows_per_page
+        if self.captured_orders:
+            matched = [
+                order for order in self.captured_orders
+                if start_time <= order['paidTime'] <= end_time
+            ]
+            return len(matched), matched[offset:offset + rows_per_page]
+        seqs = seq_range(start_time, end_time, self.total)
+        return len(seqs), [
+            make_order(seq) for seq in seqs[offset:offset + rows_per_page]
+        ]
+
+    def order_items(self, order_ids):
+        """返回: {订单ID: 商品html}"""
+        items = {}
+        for order_id in order_ids:
+            if order_id in self.captured_items:
+                items[order_id] = self.captured_items[order_id]
+            elif order_id.isdigit() and not self.captured_orders:
+                items[order_id] = make_items_html(int(order_id) -
+                                                  ORDER_ID_BASE)
+            else:
+                items[order_id] = ''
+        return items
+
+
+def make_handler(erp):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_body(self, status, body, content_type):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            mod = parse_qs(urlparse(self.path).query).get('mod', [''])[0]
+            length = int(self.headers.get('Content-Length', 0))
+            form = parse_qs(self.rfile.read(length).decode('utf-8'))
+            if mod not in ('order.oTc', 'order.showOrderItems'):
+                self.send_body(404, b'not found', 'text/plain')
+                return
+
+            fault = erp.fault()
+            if fault == 'error':
+                erp.count('errors')
+                self.send_body(500, b'internal error', 'text/plain')
+                return
+            if fault == 'expired':
+                erp.count('expired')
+                self.send_body(200, EXPIRED_HTML.encode('utf-8'),
+                               'text/html; charset=utf-8')
+                return
+
+            if mod == 'order.oTc':
+                total, orders = erp.order_page(
+                    form.get('startTime1', [''])[0],
+                    form.get('endTime1', ['9999'])[0],
+                    int(form.get('page', ['1'])[0]),
+                    int(form.get('rowsPerPage', ['500'])[0]))
+                erp.count('orders', len(orders))
+                data = {'pageCount': total, 'orderDataList': orders}
+            else:
+                order_ids = [
+                    order_id for order_id in form.get('orderItemIq', [''])
+                    [0].split(',') if order_id
+                ]
+                items = erp.order_items(order_ids)
+                erp.count('items', len(items))
+                data = {'order_list_html_header': items}
+            self.send_body(200,
+                           json.dumps(data, ensure_ascii=False).encode('utf-8'),
+                           'application/json; charset=utf-8')
+
+    return Handler
+
+
+def start_server(erp, host='127.0.0.1', port=8765):
+    """
+    在后台线程启动模拟服务(port=0时自动选择端口)
+    返回: (server, 服务地址)
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(erp))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--orders', type=int, default=1000, help='合成订单数量')
+    parser.add_argument('--captured',
+                        action='append',
+                        default=[],
+                        help='抓取的接口响应JSON文件，可重复指定')
+    parser.add_argument('--latency', type=float, default=0, help='基础延迟(毫秒)')
+    parser.add_argument('--jitter', type=float, default=0, help='随机延迟上限(毫秒)')
+    parser.add_argument('--error-rate', type=float, default=0, help='500错误概率')
+    parser.add_argument('--expired-rate',
+                        type=float,
+                        default=0,
+                        help='登录超时页面概率')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+    args = parser.parse_args()
+
+    erp = FakeErp(orders=args.orders,
+                  captured=args.captured,
+                  latency=args.latency,
+                  jitter=args.jitter,
+                  error_rate=args.error_rate,
+                  expired_rate=args.expired_rate,
+                  seed=args.seed)
+    server, url = start_server(erp, args.host, args.port)
+    print(f"模拟马帮ERP已启动: {url}")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"已返回 订单 {erp.stats['orders']} 个, 商品html "
+                  f"{erp.stats['items']} 个, 错误 {erp.stats['errors']} 次, "
+                  f"登录超时 {erp.stats['expired']} 次")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
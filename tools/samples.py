@@ -0,0 +1,104 @@
+"""
+合成的马帮ERP数据，结构与 orderalllist / showOrderItems 接口返回一致，
+供本地模拟服务和性能测试使用
+"""
+from datetime import datetime, timedelta
+
+STATUSES = ['待发货', '待发货', '待发货', '已发货', '已作废']
+CARRIERS = ['', '澳邮小包[4PX]', '英国专线[YunExpress]']
+ORDER_ID_BASE = 1000000  # 订单ID = ORDER_ID_BASE + 序号
+PAID_BASE = datetime(2025, 10, 1)  # 第一个订单的付款时间
+PAID_INTERVAL = 60  # 相邻订单付款时间间隔(秒)
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def paid_time(seq):
+    """订单付款时间，随序号递增，便于按时间范围换算序号"""
+    return (PAID_BASE + timedelta(seconds=seq * PAID_INTERVAL)).strftime(
+        TIME_FORMAT)
+
+
+def seq_range(start_time, end_time, total):
+    """
+    付款时间在 [start_time, end_time] 内的订单序号范围
+    返回: range
+    """
+    start = datetime.strptime(start_time, TIME_FORMAT) - PAID_BASE
+    end = datetime.strptime(end_time, TIME_FORMAT) - PAID_BASE
+    first = max(-(-int(start.total_seconds()) // PAID_INTERVAL), 0)
+    last = min(int(end.total_seconds()) // PAID_INTERVAL, total - 1)
+    return range(first, max(last + 1, first))
+
+
+def make_order(seq):
+    """生成一条订单列表数据"""
+    carrier = CARRIERS[seq % len(CARRIERS)]
+    status = STATUSES[seq % len(STATUSES)]
+    carrier_html = f'<div class="logistics"><p>{carrier}</p></div>' \
+        if carrier else '<div class="logistics"><p>物流渠道未选择</p></div>'
+    paid = paid_time(seq)
+    express = '--' if status != '已发货' else paid
+    return {
+        'id': str(ORDER_ID_BASE + seq),
+        'isRefund': 0,
+        'platformOrderId': f'{20000000000 + seq}',
+        'salesRecordNumber': f'{50000 + seq}',
+        'platform_order_status': 'Paid',
+        'orderRemarkText': '',
+        'paidTime': paid,
+        'paidTimeTimezone': f'{paid}(UTC+8)',
+        'expressTime': express,
+        'expressTimezone': express if express == '--' else f'{express}(UTC+8)',
+        'createDate': paid,
+        'createDateTimezone': f'{paid}(UTC+8)',
+        'orderDeliverTimezone': '--',
+        'cansend1logisticsHtml': carrier_html,
+        'shippingService': 'Standard',
+        'trackNumber': f'LP{seq:010d}' if carrier else '',
+        'countryCode': 'AU' if seq % 3 else 'GB',
+        'shopIdText': f'store-{seq % 8}',
+        'platformIdText': 'eBay',
+        'orderWeight': 80 + seq % 900,
+        'showOrderStatusText': status,
+        'buyerUserId': f'buyer{seq}',
+        'buyerName': f'Buyer {seq}',
+        'countryCodeEn': 'Australia' if seq % 3 else 'United Kingdom',
+        'province': 'NSW',
+        'city': 'Sydney',
+        'postCode': f'{2000 + seq % 900}',
+        'street1': f'{seq} George St',
+        'street2': '',
+        'email': f'buyer{seq}@example.com',
+        'shippingFee_original': '1.50',
+        'shippingFee': '7.20',
+        'shippingCost': 'RMB12.30',
+        'accountOrderFee_original': '1,024.90',
+        'accountOrderFee': '4,912.00',
+        'currencyId': 'AUD',
+        'profit': '35.10',
+        'profit_original': '7.30',
+        'profit_rate': '0.21',
+        'buyerMessageText': '',
+    }
+
+
+def make_item_row(seq, line):
+    """生成一行订单商品html"""
+    return (
+        '<tr class="order-item">'
+        f'<td><img src="https://img.example.com/sku/{seq}_{line}.jpg" /></td>'
+        '<td>'
+        f'<a data-copy-id="copySkuNumber" href="javascript:;">SKU{seq % 500:05d}-{line}</a>'
+        f'<p><a href="https://www.ebay.com.au/itm/{3000000 + seq}" target="_blank">{3000000 + seq}</a></p>'
+        f'<span data-field="productName" title="Phone case &amp; cover {seq % 50}">Phone case</span>'
+        '<p data-field="specifics" data-original-title="Colour: Black&lt;br/&gt;Model: A15">规格</p>'
+        '</td>'
+        f'<td><span class="label stock-product-nums">{line + 1}</span></td>'
+        f'<td data-field="sellPrice"><p> {seq % 40 + 0.5:.2f} </p></td>'
+        '</tr>')
+
+
+def make_items_html(seq, lines=None):
+    """生成一个订单的商品html(1~3个商品)"""
+    lines = lines if lines is not None else seq % 3 + 1
+    return ''.join(make_item_row(seq, line) for line in range(lines))